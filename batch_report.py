@@ -0,0 +1,180 @@
+# ------------ Libraries import ---------------------------
+import argparse
+import os
+import multiprocessing
+import numpy as np
+import pandas as pd
+from home_risk_assets import DATA_PATH, EXPLAINER_PATH, TARGET, load_pickle
+from column_store import load_frame
+from neighbours import ProbabilityRankIndex, filter_near_customer
+from shap_store import compute_shap_values
+from scoring_client import TRESHOLD, LocalScorer
+
+## above the treshold and up to this probability the refused loans should be discussed with the adviser ##
+DISCUSS_MAX = 0.52
+## number of loans processed by a worker at once (also the size of the chunks written) ##
+CHUNKSIZE = 1000
+
+## data and explainer loaded once in the parent process, shared by the forked workers ##
+_worker = {}
+
+# ------------ Function used for the batch portfolio report -
+## Function to get the decision of a loan from its score ##
+def decision(prediction_value, treshold=TRESHOLD):
+    '''Function to get the same decision as the dashboard: accepted, refused to discuss with the adviser or refused'''
+    if prediction_value < treshold:
+        return 'acceptée'
+    if prediction_value <= DISCUSS_MAX:
+        return 'refusée_à_discuter'
+    return 'refusée'
+
+## Function to load the data and the explainer used by the report ##
+def load_shared(data_path, explainer_path, top_n, n_near_cust):
+    '''Function to load data and shap explainer and build the rank index once
+    (the scaler and the origin values of the dashboard are not needed here)'''
+    df = load_frame(data_path)
+    _worker['df'] = df
+    _worker['features'] = df.columns[: -1]
+    _worker['shap_explainer'] = load_pickle(explainer_path)
+    _worker['rank_index'] = ProbabilityRankIndex(df, TARGET)
+    _worker['top_n'] = top_n
+    _worker['n_near_cust'] = n_near_cust
+
+## Function called once when a worker process starts ##
+def init_worker(data_path, explainer_path, top_n, n_near_cust):
+    '''Forked workers already have the data of the parent (its memory pages are shared, not copied),
+    the data is only loaded again when processes are spawned (platforms without fork)'''
+    if not _worker:
+        load_shared(data_path, explainer_path, top_n, n_near_cust)
+
+## Function to get the columns of the report ##
+def report_columns(top_n, n_features):
+    '''Function to get the columns of the report, also written when no loan is selected'''
+    columns = ['loan_id', 'score', 'decision', 'near_mean_score', 'near_refused_share']
+    for rank in range(1, min(top_n, n_features) + 1):
+        columns += [f'top{rank}_feature', f'top{rank}_shap', f'top{rank}_value', f'top{rank}_near_median']
+    return columns
+
+## Function to build the report of a chunk of loans ##
+def report_chunk(cust_ids):
+    '''Function to get decision, score, top-N local shap contributions and the comparison with the near customers
+    --> cust_ids: list of Id of customer requests
+    it returns a dataframe with one line per loan'''
+    df, features, shap_explainer = _worker['df'], _worker['features'], _worker['shap_explainer']
+    rank_index, top_n, n_near_cust = _worker['rank_index'], _worker['top_n'], _worker['n_near_cust']
+    df_chunk = df.loc[cust_ids]
+    ### vectorized scoring and shap values of the whole chunk ###
+    scores = LocalScorer(shap_explainer, df_chunk, features).probabilities
+    shap_values = compute_shap_values(shap_explainer, df_chunk[features])[1]
+    top_positions = np.argsort(-np.abs(shap_values), axis=1)[:, :top_n]
+    X_chunk = df_chunk[features].to_numpy()
+    rows = []
+    for i, cust_id in enumerate(cust_ids):
+        df_near = filter_near_customer(df, cust_id, n_near_cust, TARGET, rank_index)
+        row = {'loan_id': cust_id, 'score': scores[i], 'decision': decision(scores[i]),
+               'near_mean_score': df_near[TARGET].mean(), 'near_refused_share': (df_near[TARGET] >= TRESHOLD).mean()}
+        for rank, position in enumerate(top_positions[i], start=1):
+            feature = features[position]
+            row[f'top{rank}_feature'] = feature
+            row[f'top{rank}_shap'] = shap_values[i, position]
+            row[f'top{rank}_value'] = X_chunk[i, position]
+            row[f'top{rank}_near_median'] = df_near[feature].median()
+        rows.append(row)
+    return pd.DataFrame(rows, columns=report_columns(top_n, len(features)))
+
+## Class Object to write the report chunk by chunk in CSV or Parquet ##
+class ChunkWriter:
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self._writer = None
+        self.n_rows = 0
+
+    def write(self, df_chunk):
+        if self.parquet:
+            ### pyarrow is only imported for a parquet output ###
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df_chunk.to_csv(self.path, mode='w' if self.n_rows == 0 else 'a', header=self.n_rows == 0, index=False)
+        self.n_rows += len(df_chunk)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+## Function to select the loans of the report ##
+def select_loans(df, shap_explainer, ids=None, band=None, chunksize=CHUNKSIZE):
+    '''Function to get the loans to report, Id not in the data are skipped (and printed)
+    --> df: dataframe with all customer data
+    --> ids: list of Id of customer requests, all the book if None
+    --> band: (low, high) to keep only the loans with a score in this band (e.g. borderline loans),
+    the score is the one of the report (local model), not the probability column of the data
+    it returns a list of Id of customer requests'''
+    index = df.index
+    if ids is not None:
+        known = pd.Index(ids).isin(index)
+        if not known.all():
+            unknown = [cust_id for cust_id, is_known in zip(ids, known) if not is_known]
+            print(f"{len(unknown)} prêts inconnus ignorés : {' '.join(map(str, unknown[:20]))}{' ...' if len(unknown) > 20 else ''}")
+        index = pd.Index(ids)[known].unique()
+    if band is not None:
+        ### scored by chunk so that no copy of the whole book is made ###
+        scores = np.empty(len(index))
+        for start in range(0, len(index), chunksize):
+            scores[start:start + chunksize] = LocalScorer(shap_explainer, df.loc[index[start:start + chunksize]], df.columns[: -1]).probabilities
+        index = index[(scores >= band[0]) & (scores <= band[1])]
+    return index.tolist()
+
+## Function to run the batch report ##
+def run(output, data_path=DATA_PATH, ids=None, band=None, top_n=5, n_near_cust=20, workers=None, chunksize=CHUNKSIZE,
+        explainer_path=EXPLAINER_PATH):
+    '''Function to build the report of many loans with a pool of processes, written chunk by chunk so memory stays bounded.
+    The data is loaded once in this process before the workers are forked, they share it instead of loading a copy each
+    --> output: .csv or .parquet file (only the header when no loan is selected)
+    --> workers: number of processes, all the cores by default
+    it returns the number of loans written'''
+    load_shared(data_path, explainer_path, top_n, n_near_cust)
+    cust_ids = select_loans(_worker['df'], _worker['shap_explainer'], ids, band, chunksize)
+    chunks = [cust_ids[start:start + chunksize] for start in range(0, len(cust_ids), chunksize)]
+    writer = ChunkWriter(output)
+    if not chunks:
+        print('Aucun prêt sélectionné, seul l\'en-tête du rapport est écrit')
+        writer.write(pd.DataFrame(columns=report_columns(top_n, len(_worker['features']))))
+        writer.close()
+        return 0
+    ### fork when available so that the workers share the data loaded above ###
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    try:
+        with context.Pool(workers, initializer=init_worker, initargs=(data_path, explainer_path, top_n, n_near_cust)) as pool:
+            ### chunks are written in order as soon as they are ready ###
+            for df_chunk in pool.imap(report_chunk, chunks):
+                writer.write(df_chunk)
+                print(f'{writer.n_rows}/{len(cust_ids)} prêts traités')
+    finally:
+        writer.close()
+    return writer.n_rows
+
+if __name__ == '__main__':
+    ## e.g. borderline band: python batch_report.py rapport.csv --band 0.49 0.52 ##
+    parser = argparse.ArgumentParser(description='Batch report of loans: decision, score, top shap contributions and near customers')
+    parser.add_argument('output', help='.csv or .parquet file')
+    parser.add_argument('--data', default=DATA_PATH, help='CSV data file or column store folder')
+    parser.add_argument('--ids', type=int, nargs='+', help='Id of customer requests (all the book by default)')
+    parser.add_argument('--ids-file', help='file with one Id of customer request per line')
+    parser.add_argument('--band', type=float, nargs=2, metavar=('LOW', 'HIGH'), help='keep the loans with a score in this band')
+    parser.add_argument('--top-n', type=int, default=5, help='number of shap contributions reported')
+    parser.add_argument('--n-near', type=int, default=20, help='number of near customers compared')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+    ids = args.ids
+    if args.ids_file:
+        ids = (ids or []) + np.loadtxt(args.ids_file, dtype=np.int64, ndmin=1).tolist()
+    n_rows = run(args.output, args.data, ids, args.band, args.top_n, args.n_near, args.workers, args.chunksize)
+    print(f'{n_rows} prêts écrits dans {args.output}')
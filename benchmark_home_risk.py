@@ -0,0 +1,184 @@
+# ------------ Libraries import ---------------------------
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from home_risk_assets import DATA_PATH, EXPLAINER_PATH, SCALER_PATH, TARGET, load_pickle
+from neighbours import ProbabilityRankIndex, filter_near_customer
+from binning import BinningTable, bin_location
+from box_stats import BoxStatsTable
+
+## sizes of the synthetic portfolios ##
+SIZES = [10000, 100000, 1000000]
+## above this number of loans the benchmarks copying the whole frame (inverse_transform) are skipped ##
+FULL_CASES_MAX_ROWS = 100000
+## baseline file used to detect regressions ##
+BASELINE_PATH = r'benchmark_baseline.json'
+## a benchmark is a regression when its throughput drops more than this ratio under the baseline ##
+TOLERANCE = 0.2
+
+# ------------ Synthetic data with the schema of the dashboard data -
+## Function to get the columns of the data file ##
+def schema_columns(data_path=DATA_PATH, explainer_path=EXPLAINER_PATH, scaler_path=SCALER_PATH):
+    '''Function to get the features name of the dashboard data: header of the data file if available,
+    otherwise features of the lgbm model, otherwise generic names with the size of the standard scaler
+    it returns the features name (the probability column is not included)'''
+    if os.path.exists(data_path) and not os.path.isdir(data_path):
+        return pd.read_csv(data_path, index_col=0, nrows=0).columns[: -1].tolist()
+    try:
+        return list(load_pickle(explainer_path).model.original_model.feature_name())
+    except Exception:
+        return [f'feature_{i}' for i in range(len(load_pickle(scaler_path).mean_))]
+
+## Function to generate a synthetic applicant frame ##
+def synthetic_sample(n_rows, features, seed=0, dtype='float64', chunksize=100000):
+    '''Function to generate standard scaled applicants with the same schema as test_sample_data_home_risk.csv
+    --> n_rows: number of loans
+    --> features: features name
+    --> dtype: 'float32' halves the memory of the frame (1M loans x 795 features: 3.2 GB instead of 6.4 GB)
+    it returns a dataframe indexed by loan ID with the probability as last column'''
+    random_state = np.random.RandomState(seed)
+    ### generated by chunk so that no float64 copy of the whole frame is needed ###
+    X = np.empty((n_rows, len(features)), dtype=dtype)
+    for start in range(0, n_rows, chunksize):
+        X[start:start + chunksize] = random_state.standard_normal((min(chunksize, n_rows - start), len(features)))
+    ### probability from a random linear model so that it is correlated with the features ###
+    weights = random_state.normal(0, 1 / np.sqrt(len(features)), len(features))
+    prob = 1 / (1 + np.exp(-(X @ weights - 1)))
+    df = pd.DataFrame(X, columns=features, index=pd.Index(np.arange(100001, 100001 + n_rows), name='SK_ID_CURR'))
+    df[TARGET] = prob
+    return df
+
+# ------------ Function used to run the benchmarks ---------
+## Function to time a function and measure its peak memory ##
+def measure(fn, n_items, repeat=3):
+    '''Function to get the best duration over repeat runs and the peak memory of one run
+    --> fn: function without argument to benchmark
+    --> n_items: number of items processed by one call (rows, queries, ...) to compute the throughput'''
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    ### memory measured in a separate run, tracemalloc slows down the code ###
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = min(durations)
+    return {'seconds': best, 'throughput': n_items / best if best > 0 else float('inf'), 'peak_mb': peak / 1024 ** 2}
+
+## Function to get the benchmarks of the hot functions of the dashboard ##
+def benchmark_cases(df, features, std_scaler=None, shap_explainer=None, n_queries=100):
+    '''Function to build the list of (name, function, number of items) to benchmark on df
+    --> std_scaler, shap_explainer: the dashboard models, benchmarks using them are skipped if None'''
+    random_state = np.random.RandomState(1)
+    cust_ids = df.index[random_state.randint(0, len(df), n_queries)]
+    rank_index = ProbabilityRankIndex(df, TARGET)
+    binning_table = BinningTable(df, features[:20])
+    box_stats_table = BoxStatsTable(df, features[:20])
+    values = df[features[0]].to_numpy()
+    cases = [
+        ('rank_index_build', lambda: ProbabilityRankIndex(df, TARGET), len(df)),
+        ('filter_near_customer', lambda: [filter_near_customer(df, c, 20, TARGET, rank_index) for c in cust_ids], n_queries),
+        ('filter_near_customer_distance', lambda: [filter_near_customer(df, c, 20, TARGET, rank_index, 'distance') for c in cust_ids], n_queries),
+        ('bin_location', lambda: bin_location(binning_table.bins(features[0]), values), len(df)),
+        ('binning_table_build_20_features', lambda: BinningTable(df, features[:20]), len(df)),
+        ('boxplot_population_20_features', lambda: BoxStatsTable(df, features[:20]), len(df)),
+        ('boxplot_group', lambda: [box_stats_table.group_stats(filter_near_customer(df, c, 20, TARGET, rank_index), features[:5], 'g')
+                                   for c in cust_ids], n_queries),
+    ]
+    try:
+        from bivariate import bivariate_figure
+        df_near = filter_near_customer(df, cust_ids[0], 20, TARGET, rank_index)
+        cases.append(('scatter_figure', lambda: bivariate_figure(df, df_near, cust_ids[0], features[0], features[1], TARGET, 0.49), 1))
+    except ImportError:
+        pass
+    ### the inverse transform returns a float64 copy of the frame (and df[features] another one) ###
+    if std_scaler is not None and len(df) <= FULL_CASES_MAX_ROWS:
+        cases.append(('inverse_transform', lambda: std_scaler.inverse_transform(df[features]), len(df)))
+    if shap_explainer is not None:
+        single = df.loc[[cust_ids[0]], features]
+        batch = df[features].iloc[:1000]
+        cases.append(('shap_values_single_row', lambda: shap_explainer.shap_values(single), 1))
+        cases.append(('shap_values_batch_1000', lambda: shap_explainer.shap_values(batch), len(batch)))
+    return cases
+
+## Function to run all the benchmarks for all the sizes ##
+def run(sizes=SIZES, repeat=3, with_models=True, dtype='float64', n_features=None):
+    '''Function to run the benchmarks headlessly (no streamlit) on synthetic portfolios
+    --> dtype: dtype of the synthetic data ('float32' to run the largest sizes on smaller instances)
+    --> n_features: number of features kept from the schema (all by default)
+    it returns a dict with the environment and one result per (size, benchmark)'''
+    features = schema_columns()[:n_features]
+    std_scaler = shap_explainer = None
+    ### the models need all the features of the schema ###
+    if with_models and n_features is None:
+        ### models are optional, their benchmarks are skipped if they can not be loaded here ###
+        try:
+            std_scaler = load_pickle(SCALER_PATH)
+            shap_explainer = load_pickle(EXPLAINER_PATH)
+        except Exception as e:
+            print(f'Models not loaded, their benchmarks are skipped ({e.__class__.__name__}: {e})')
+    results = {}
+    for n_rows in sizes:
+        df = synthetic_sample(n_rows, features, dtype=dtype)
+        for name, fn, n_items in benchmark_cases(df, features, std_scaler, shap_explainer):
+            result = measure(fn, n_items, repeat)
+            results[f'{n_rows}/{name}'] = result
+            print(f"{n_rows:>8} {name:<35} {result['seconds'] * 1000:>10.2f} ms {result['throughput']:>14.1f} /s {result['peak_mb']:>9.1f} MB")
+        del df
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'n_features': len(features), 'dtype': dtype,
+            'results': results}
+
+## Function to compare results with a stored baseline ##
+def compare(report, baseline, tolerance=TOLERANCE):
+    '''Function to find the benchmarks whose throughput dropped more than tolerance under the baseline
+    it returns the list of (benchmark, baseline throughput, throughput, ratio)'''
+    regressions = []
+    for name, result in report['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        ratio = result['throughput'] / reference['throughput']
+        if ratio < 1 - tolerance:
+            regressions.append((name, reference['throughput'], result['throughput'], ratio))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the dashboard hot functions on synthetic portfolios')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='number of loans of the synthetic portfolios')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-models', action='store_true', help='skip the benchmarks of the scaler and shap explainer')
+    parser.add_argument('--float32', action='store_true', help='synthetic data in float32 (half the memory)')
+    parser.add_argument('--n-features', type=int, help='number of features of the synthetic data (all the schema by default, the models are then skipped)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--output', help='JSON file where the results are written')
+    args = parser.parse_args()
+    report = run(args.sizes, args.repeat, not args.no_models, 'float32' if args.float32 else 'float64', args.n_features)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline saved in {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        ### results on another data shape are not comparable ###
+        baseline_shape = (baseline.get('n_features'), baseline.get('dtype', 'float64'))
+        if baseline_shape != (report['n_features'], report['dtype']):
+            raise SystemExit(f'Baseline made with {baseline_shape[0]} {baseline_shape[1]} features, not compared')
+        regressions = compare(report, baseline, args.tolerance)
+        for name, reference, throughput, ratio in regressions:
+            print(f'REGRESSION {name}: {throughput:.1f} /s instead of {reference:.1f} /s ({ratio:.0%})')
+        if regressions:
+            raise SystemExit(1)
+        print('No regression compared to the baseline')
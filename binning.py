@@ -0,0 +1,75 @@
+# ------------ Libraries import ---------------------------
+import copy
+import numpy as np
+
+## same number of bins as the default of plt.hist ##
+N_BINS = 10
+
+# ------------ Function and class used for histograms ----
+## Function to fin in histogram in which bin is a value for visualization purpose
+def bin_location(bins, value):
+    '''Function to locate the bin were a single value is located in order to apply formatting to this specific bin
+    bins --> list of bins return by plt.hist plot (edges, sorted)
+    value --> the sepcific value (or array of values) to locate in a matplotlib histogramm
+    it returns the index value in bins where value is located'''
+    ### left closed bins, the last one also contains its right edge (same rule as BinningTable and plt.hist) ###
+    bins = np.asarray(bins)
+    index = np.searchsorted(bins, value, side='right') - 1
+    index = np.where(np.asarray(value) == bins[-1], len(bins) - 2, index)
+    return np.clip(index, 0, len(bins) - 2)
+
+## Class Object with the bins of all the features for the whole population, built once ##
+class BinningTable:
+
+    def __init__(self, df, features, n_bins=N_BINS):
+        '''--> df: dataframe with all customer data
+        --> features: features column name to bin
+        --> n_bins: number of bins of each histogram'''
+        self.features = list(features)
+        self.n_bins = n_bins
+        self._position = {feature: i for i, feature in enumerate(self.features)}
+        X = df[self.features].to_numpy(dtype=np.float64)
+        ### equal width edges from min to max of each feature (same as plt.hist), one line per feature ###
+        low, high = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+        high = np.where(high > low, high, low + 1)
+        self.edges = np.linspace(low, high, n_bins + 1, axis=1)
+        ### counts of each feature for the whole population ###
+        self.counts = np.stack([self._count(X[:, i], self.edges[i]) for i in range(len(self.features))])
+
+    def _count(self, values, edges):
+        ### left closed bins, the last one also contains its right edge (same as plt.hist) ###
+        index = np.searchsorted(edges, values, side='right') - 1
+        index[values == edges[-1]] = self.n_bins - 1
+        ### values out of the population range (and missing values) are not counted ###
+        valid = (index >= 0) & (index < self.n_bins)
+        return np.bincount(index[valid], minlength=self.n_bins)
+
+    def bins(self, feature):
+        '''Function to get the edges of the bins of a feature'''
+        return self.edges[self._position[feature]]
+
+    def population_counts(self, feature):
+        '''Function to get the counts of each bin of a feature for the whole population'''
+        return self.counts[self._position[feature]]
+
+    def group_counts(self, feature, values):
+        '''Function to get the counts of each bin of a feature for a group of customers (same edges as the population)
+        --> values: values of the feature for the group'''
+        return self._count(np.asarray(values, dtype=np.float64), self.bins(feature))
+
+    def updated(self, old_rows, new_rows):
+        '''Function to get the table of a new version of the population by counting only the changed loans.
+        The edges are kept, so the table is built again (None is returned) when a new value is out of them
+        --> old_rows: dataframe with the previous values of the updated loans
+        --> new_rows: dataframe with the values of the new or updated loans
+        it returns a new BinningTable (this one is not modified, it can still be used by other sessions) or None'''
+        X_old = old_rows[self.features].to_numpy(dtype=np.float64)
+        X_new = new_rows[self.features].to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            if ((X_new < self.edges[:, 0]) | (X_new > self.edges[:, -1])).any():
+                return None
+        table = copy.copy(self)
+        table.counts = self.counts.copy()
+        for i in range(len(self.features)):
+            table.counts[i] += self._count(X_new[:, i], self.edges[i]) - self._count(X_old[:, i], self.edges[i])
+        return table
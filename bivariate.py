@@ -0,0 +1,66 @@
+# ------------ Libraries import ---------------------------
+import os
+import numpy as np
+import plotly.graph_objects as go
+
+## above this number of customers the population is downsampled before being sent to the browser (BIVARIATE_MAX_POINTS) ##
+MAX_POINTS = int(os.environ.get('BIVARIATE_MAX_POINTS', 20000))
+
+# ------------ Function used for the bivariate scatter plot -
+## Function to select a stratified sample of positions ##
+def stratified_sample(mask, max_points, seed=0):
+    '''Function to sample at most max_points positions keeping the proportion of True and False in mask.
+    The seed is fixed so that the same figure is produced at each rerun (and can be cached)
+    --> mask: boolean array (e.g. accepted loans)
+    it returns the sorted positions kept for each stratum (True positions, False positions)'''
+    random_state = np.random.RandomState(seed)
+    ratio = min(1., max_points / max(len(mask), 1))
+    samples = []
+    for stratum in (np.flatnonzero(mask), np.flatnonzero(~mask)):
+        n_keep = int(round(len(stratum) * ratio))
+        samples.append(np.sort(random_state.choice(stratum, n_keep, replace=False)) if n_keep < len(stratum) else stratum)
+    return samples
+
+## Function to add accepted and denied customers of a group as two WebGL scatter traces ##
+def _add_group(figure, x, y, prob, positions_accepted, positions_denied, name, suffix=''):
+    for positions, answer, symbol in ((positions_accepted, 'acceptés', 'circle'), (positions_denied, 'refusés', 'x')):
+        figure.add_trace(go.Scattergl(x=x[positions], y=y[positions], mode='markers', name=f'{name}_prêt_{answer}{suffix}',
+        marker_symbol=symbol, marker={'color': prob[positions], 'coloraxis': 'coloraxis'}))
+
+## Function to build the bivariate scatter plot ##
+def bivariate_figure(df, df_nearest_client, cust_id, feat1, feat2, target, treshold, max_points=MAX_POINTS):
+    '''Function to build the scatter plot of two features for all the customers, the near customers and the selected one.
+    The population is sent as a stratified sample (accepted / denied) above max_points, near customers and
+    the selected customer are always drawn exactly
+    --> df: dataframe with all customer data
+    --> df_nearest_client: dataframe with the near customers
+    --> cust_id: Id of a customer request
+    --> feat1, feat2: features on x and y axis
+    --> target: name of the column contaigning the probability
+    --> treshold: probability over which the loan is refused'''
+    figure = go.Figure()
+    ### all client scatter filtered with the probability column and treshold (mask computed once) ###
+    x, y, prob = (df[c].to_numpy() for c in (feat1, feat2, target))
+    accepted = prob < treshold
+    if len(df) > max_points:
+        positions_accepted, positions_denied = stratified_sample(accepted, max_points)
+        suffix = f' (échantillon {len(positions_accepted) + len(positions_denied)}/{len(df)})'
+    else:
+        positions_accepted, positions_denied = np.flatnonzero(accepted), np.flatnonzero(~accepted)
+        suffix = ''
+    _add_group(figure, x, y, prob, positions_accepted, positions_denied, 'Tous les clients', suffix)
+    ### near customer scatter filtered with the probability column and treshold ###
+    x, y, prob = (df_nearest_client[c].to_numpy() for c in (feat1, feat2, target))
+    accepted = prob < treshold
+    _add_group(figure, x, y, prob, np.flatnonzero(accepted), np.flatnonzero(~accepted), 'clients_similaires')
+    ### plot selected client point ###
+    figure.add_trace(go.Scattergl(x=[df.loc[cust_id, feat1]], y=[df.loc[cust_id, feat2]],
+    mode='markers', name='ID_prêt_client_selectionné',
+    marker={'size': 20, 'color': [df.loc[cust_id, target]], 'coloraxis': 'coloraxis',
+    'line': {'width': 3, 'color': 'black'}}))
+    ### update legend localisation and add colorbar ###
+    figure.update_layout(legend={'orientation': "h", 'yanchor': 'bottom', 'y': 1.05, 'xanchor': 'right', 'x': 1,
+    'bgcolor': 'white', 'font': {'color': 'black'}}, xaxis={'title': feat1},
+    yaxis={'title': feat2}, coloraxis={'colorbar': {'title': 'Score'},
+                                       'colorscale': 'RdYlGn_r', 'cmin': 0, 'cmax': 1, 'showscale': True})
+    return figure
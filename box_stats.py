@@ -0,0 +1,46 @@
+# ------------ Libraries import ---------------------------
+import numpy as np
+
+## whiskers reach the most extreme values within WHIS times the interquartile range (same as seaborn/matplotlib) ##
+WHIS = 1.5
+
+# ------------ Function and class used for boxplots ------
+## Function to compute the boxplot statistics of all the columns of an array at once ##
+def box_stats(X, whis=WHIS):
+    '''Function to compute quartiles and whiskers of each column of X without any dataframe copy
+    --> X: 2D array (customers, features), missing values are ignored
+    it returns a dict of arrays (one value per feature) with the keys used by matplotlib bxp'''
+    X = np.asarray(X, dtype=np.float64)
+    q1, med, q3 = np.nanpercentile(X, [25, 50, 75], axis=0)
+    iqr = q3 - q1
+    ### most extreme values inside the fences, values outside (and missing values) are ignored ###
+    with np.errstate(invalid='ignore'):
+        whislo = np.nanmin(np.where(X >= q1 - whis * iqr, X, np.nan), axis=0)
+        whishi = np.nanmax(np.where(X <= q3 + whis * iqr, X, np.nan), axis=0)
+    return {'q1': q1, 'med': med, 'q3': q3, 'whislo': whislo, 'whishi': whishi}
+
+## Function to get the statistics of some features in the format of matplotlib bxp ##
+def bxp_stats(stats, positions, label):
+    '''Function to convert box_stats arrays in the list of dict expected by matplotlib Axes.bxp
+    --> stats: dict returned by box_stats
+    --> positions: positions in the stats arrays of the features to draw
+    --> label: name of the group of customers'''
+    return [{'label': label, 'fliers': [], **{key: stats[key][p] for key in stats}} for p in positions]
+
+## Class Object with the boxplot statistics of the whole population, built once ##
+class BoxStatsTable:
+
+    def __init__(self, df, features):
+        '''--> df: dataframe with all customer data
+        --> features: features column name'''
+        self.features = list(features)
+        self._position = {feature: i for i, feature in enumerate(self.features)}
+        self.population = box_stats(df[self.features].to_numpy())
+
+    def population_stats(self, selected_features, label):
+        '''Function to get the precomputed statistics of the selected features for matplotlib bxp'''
+        return bxp_stats(self.population, [self._position[f] for f in selected_features], label)
+
+    def group_stats(self, df_group, selected_features, label):
+        '''Function to compute the statistics of the selected features for a group of customers (near clients)'''
+        return bxp_stats(box_stats(df_group[list(selected_features)].to_numpy()), range(len(selected_features)), label)
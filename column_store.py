@@ -0,0 +1,117 @@
+# ------------ Libraries import ---------------------------
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+## name of the description file of a column store folder ##
+MANIFEST = 'manifest.json'
+## name of the file with the loan ID ##
+INDEX_FILE = 'index.npy'
+## name of the file with the values, one (loan, column) matrix stored column by column ##
+VALUES_FILE = 'values.npy'
+
+# ------------ Function and class used for the columnar storage -
+## Function to convert the CSV data file in a memory-mappable .npy file stored column by column ##
+def convert_csv(csv_path, out_dir, dtype='float64', chunksize=50000):
+    '''Function to convert a CSV data file (first column is the loan ID) in a column store folder.
+    The CSV is read by chunk and written directly in the .npy file so that memory stays bounded
+    --> csv_path: path of the CSV data file
+    --> out_dir: folder of the column store
+    --> dtype: dtype of the stored columns ('float32' halves the size)
+    it returns the path of the manifest'''
+    from home_risk_assets import file_hash
+    ### rows counted by the CSV parser itself (blank lines and quoted line breaks are not loans), only the ID is parsed ###
+    n_rows = sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=[0], chunksize=chunksize))
+    if n_rows == 0:
+        raise ValueError(f'{csv_path} has no loan to convert')
+    header = pd.read_csv(csv_path, index_col=0, nrows=0)
+    columns = header.columns.tolist()
+    os.makedirs(out_dir, exist_ok=True)
+    ### column-major (Fortran order): the values of a column are contiguous on disk ###
+    values = np.lib.format.open_memmap(os.path.join(out_dir, VALUES_FILE), mode='w+', dtype=dtype,
+                                       shape=(n_rows, len(columns)), fortran_order=True)
+    index = None
+    start = stop = 0
+    for chunk in pd.read_csv(csv_path, index_col=0, chunksize=chunksize):
+        stop = start + len(chunk)
+        if stop > n_rows:
+            break
+        values[start:stop] = chunk.to_numpy(dtype=dtype)
+        if index is None:
+            index = np.lib.format.open_memmap(os.path.join(out_dir, INDEX_FILE), mode='w+',
+                                              dtype=chunk.index.dtype, shape=(n_rows,))
+        index[start:stop] = chunk.index.to_numpy()
+        start = stop
+    if stop != n_rows:
+        raise ValueError(f'{csv_path} changed during the conversion: {stop} rows read instead of {n_rows}')
+    for array in (values, index):
+        array.flush()
+    ### manifest written last, a folder without manifest is an incomplete conversion ###
+    manifest = {'columns': columns, 'index_name': header.index.name, 'n_rows': n_rows, 'dtype': dtype,
+                'source': os.path.basename(csv_path), 'source_hash': file_hash(csv_path)}
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
+
+## Class Object to read the columns of a column store only when they are used ##
+class ColumnStore:
+
+    def __init__(self, path, float32=False):
+        '''--> path: folder of the column store
+        --> float32: downcast float64 columns to float32 when they are read (the whole frame is then read at once,
+        convert the CSV with --float32 to keep the lazy loading)'''
+        self.path = path
+        self.float32 = float32
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.columns = pd.Index(self.manifest['columns'])
+        self.index = pd.Index(np.load(os.path.join(path, INDEX_FILE)), name=self.manifest['index_name'])
+        ### memory map of the (loan, column) values, nothing is read before the values are used ###
+        self.values = np.load(os.path.join(path, VALUES_FILE), mmap_mode='r')
+
+    def __len__(self):
+        return self.manifest['n_rows']
+
+    def _downcast(self, array):
+        if self.float32 and array.dtype == np.float64:
+            return array.astype(np.float32)
+        return array
+
+    def column(self, name):
+        '''Function to get one column as a memory-mapped array (nothing is read before the values are used)'''
+        return self._downcast(self.values[:, self.columns.get_loc(name)])
+
+    def frame(self, columns=None):
+        '''Function to get a dataframe with only some columns (all by default).
+        With all the columns the dataframe is a single block over the memory map (pandas does not copy it),
+        so a column is only read from disk when it is used, otherwise only the asked columns are read'''
+        if columns is None:
+            return pd.DataFrame(self._downcast(self.values), index=self.index, columns=self.columns, copy=False)
+        values = self._downcast(self.values[:, [self.columns.get_loc(name) for name in columns]])
+        return pd.DataFrame(values, index=self.index, columns=columns, copy=False)
+
+## Function to load the data from a CSV file or from a column store folder ##
+def load_frame(path, columns=None, float32=False):
+    '''Function to load the customer data whatever the storage
+    --> path: CSV data file or column store folder
+    --> columns: columns to load (all by default), with a CSV only these columns are parsed
+    --> float32: downcast float64 columns to float32'''
+    if os.path.isdir(path):
+        return ColumnStore(path, float32).frame(columns)
+    usecols = None if columns is None else [0] + [pd.read_csv(path, index_col=0, nrows=0).columns.get_loc(c) + 1 for c in columns]
+    df = pd.read_csv(path, index_col=0, usecols=usecols)
+    if float32:
+        df = df.astype({c: np.float32 for c in df.columns if df[c].dtype == np.float64})
+    return df
+
+if __name__ == '__main__':
+    ## one-shot conversion: python column_store.py test_sample_data_home_risk.csv test_sample_data_home_risk [--float32] ##
+    parser = argparse.ArgumentParser(description='Convert the CSV data file in a column store folder')
+    parser.add_argument('csv_path')
+    parser.add_argument('out_dir')
+    parser.add_argument('--float32', action='store_true', help='store the columns as float32')
+    args = parser.parse_args()
+    print(convert_csv(args.csv_path, args.out_dir, 'float32' if args.float32 else 'float64'))
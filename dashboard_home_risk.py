@@ -1,31 +1,113 @@
 # ------------ Libraries import ---------------------------
-import pandas as pd
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 import seaborn as sns
+import os
+import time
 import requests
-import pickle
 import shap
 from PIL import Image
+from incremental_refresh import AssetsRegistry
+from shap_store import load_shap_store
+from neighbours import ProbabilityRankIndex, filter_near_customer
+from similarity import MAX_INDEXES, METRICS, FeatureNeighbourIndex, filter_similar_customer
+from scoring_client import LocalScorer, ScoringClient
+from figure_cache import FigureCache
+from lru_cache import LRUCache
+from binning import BinningTable, bin_location
+from box_stats import BoxStatsTable
+from bivariate import bivariate_figure
+from perf_monitor import PerfMonitor, current_session_id
+from matplotlib.lines import Line2D
+from matplotlib.patches import Patch
+
+# ------------ Set base configuration for streamlit -------
+### must be the first streamlit command, before the cached loaders below display their spinner ###
+st.set_page_config(layout="wide")
+
+## Timing of each section, shared by all sessions (admin panel displayed when DASHBOARD_ADMIN=1) ##
+@st.experimental_singleton
+def get_perf_monitor():
+    return PerfMonitor()
+
+perf_monitor = get_perf_monitor()
+session_id = current_session_id()
+rerun_start = time.perf_counter()
 
 # ------------ Data Import --------------------------------
+## Load once the data, scaler and explainer, shared read-only by all sessions, reloaded only when files content change
+## and refreshed incrementally with the new or updated loans dropped in the updates folder ##
+@st.experimental_singleton
+def get_assets_registry():
+    return AssetsRegistry()
+
+# ------------ Structures derived from the data, built once per data version and kept with it -
+## Shap values computed once per assets version and memory-mapped from disk ##
+def get_shap_store(assets):
+    return assets.derived_value('shap_store', lambda: load_shap_store(assets))
+
+## Customers sorted by probability once per assets version for the near customers filter ##
+def get_rank_index(assets):
+    return assets.derived_value('rank_index', lambda: ProbabilityRankIndex(assets.df_test_sample, assets.target))
+
+## Trees over the standard scaled features, only the last used versions, metrics and features subsets are kept ##
+@st.experimental_singleton
+def get_feature_index_cache():
+    return LRUCache(MAX_INDEXES)
+
+def get_feature_index(assets, metric, feature_subset):
+    return get_feature_index_cache().get_or_build((assets.version, metric, feature_subset),
+    lambda: FeatureNeighbourIndex(assets.df_test_sample, feature_subset, metric))
+
+## Local scorer with the model of the explainer, all loans scored once per assets version (whatever the treshold) ##
+def get_local_scorer(assets):
+    return assets.derived_value('local_scorer', lambda: LocalScorer(assets.shap_explainer, assets.df_test_sample, assets.features))
+
+## Comparison of the local scores with the probabilities of the data, computed once per assets version ##
+def get_local_parity(assets):
+    return assets.derived_value('local_parity', lambda: get_local_scorer(assets).parity_check(assets.df_test_sample[assets.target]))
+
+## Histogram bins and counts of the whole population for all the features, built once per version ##
+def get_binning_table(assets):
+    return assets.derived_value('binning_table', lambda: BinningTable(assets.df_test_sample, assets.features))
+
+## Boxplot statistics of the whole population for all the features, built once per version ##
+def get_box_stats_table(assets):
+    return assets.derived_value('box_stats_table', lambda: BoxStatsTable(assets.df_test_sample, assets.features))
+
+## One scoring client (keep-alive connections and scores cache) shared by all sessions ##
+@st.experimental_singleton
+def get_scoring_client():
+    return ScoringClient()
+
+## Rendered figures shared by all sessions, keyed by section, widgets state and data version ##
+@st.experimental_singleton
+def get_figure_cache():
+    return FigureCache()
+
+## scoring backends available, default one can be set with SCORING_BACKEND environment variable ##
+SCORING_BACKENDS = ['API', 'Local']
+### case is ignored (e.g. local), an unknown value falls back on the API ###
+DEFAULT_BACKEND = {backend.lower(): i for i, backend in enumerate(SCORING_BACKENDS)}.get(
+os.environ.get('SCORING_BACKEND', 'API').strip().lower(), 0)
+## number of loans around the selected one scored in background ##
+N_PREFETCH = 10
+
+with perf_monitor.timer('chargement_donnees', session_id):
+    ### snapshot of the data used for the whole rerun, even if a refresh happens meanwhile ###
+    assets = get_assets_registry().current()
 ## Import passenger train data ##
-df_test_sample = pd.read_csv(r'test_sample_data_home_risk.csv', index_col=0)
+df_test_sample = assets.df_test_sample
 ### last feature is a probability (will be used for visualization purpose) ###
-features = df_test_sample.columns[: -1] 
-loan_id = df_test_sample.index.sort_values()
+features = assets.features
+loan_id = assets.loan_id
 treshold = 0.49
 ## import the illustration image ##
 img = Image.open(r'logo_projet_fintech.png')
-## loading the standard scaler to display normal values of client features ##
-std_scaler = pickle.load(open(r'std_scaler_home_risk.pkl', 'rb'))
-## loading shap tree explainer for our lgbm model (should be changed if our model is update!!) ##
-shap_explainer = pickle.load(open(r'shap_tree_explainer_lgbm_model.pkl', 'rb'))
-## create origin sample values ##
-df_test_sample_origin = pd.DataFrame(std_scaler.inverse_transform(df_test_sample[features]), 
-index = df_test_sample.index, columns=df_test_sample[features].columns)
+## cache of rendered figures ##
+figure_cache = get_figure_cache()
 
 # ------------ Function and class used in our dashboard -------------
 ## Class Object to use with shap waterfall plot ##
@@ -41,57 +123,20 @@ class ShapObject:
         ### features column name ###
         self.feature_names = feature_names
 
-## Function to filter dataset with nearest neighbors in terms of probability result ##
-def filter_near_customer(df, cust_id, n_near_cust, target):
-    ''' Function to filter dataframe regarding the nearest neighbors of our customer in terms of probability.
-    Note that the customer is included in the filtered DF
-    --> df: dataframe with all customer data, must have an ID for customer credit request
-    --> cust_id: Id of a customer request
-    --> n_near_cust: number of nearest customer to the id request. It must be an even number!!!
-    --> target: must be an str, name of the column contaigning the probability'''
-    df_filter = df.sort_values(by=target, ascending=False).copy()
-    ### getting true index value in the dataframe table ###
-    index_cust = np.where(df_filter.index == cust_id)[0][0]
-    ### Check if an enven number has been input, if not return non filtered dataset ###
-    if n_near_cust%2 != 0:
-        print('DataFrame has not been filtered just sorted, you have entered an odd number')
-    else:
-        ### calcul neighbours up and down our customer raw then balance if there is not enough up and down ###
-        up_index = 0
-        for t in range(1,(n_near_cust//2 + 1)):
-            if len(df_filter.iloc[index_cust - t:index_cust, :]) == 0:
-                break
-        up_index = t
-        down_index = 0
-        for t in range(1,(n_near_cust//2 + 1)):
-            if len(df_filter.iloc[index_cust:index_cust + t, :]) == 0:
-                break
-        down_index = t
-        ### Balancing if there is not the same number up and down of the customer ###
-        up_lift = n_near_cust//2 - down_index
-        down_lift = n_near_cust//2 - up_index
-        ### create filtered dataframe ###
-        df_filter = df_filter.iloc[index_cust - (up_index - up_lift):index_cust + (down_index + (down_lift + 1)),:]
-    return df_filter
-
-## Function to fin in histogram in which bin is a value for visualization purpose
-def bin_location(bins, value):
-    '''Function to locate the bin were a single value is located in order to apply formatting to this specific bin
-    bins --> list of bins return by plt.hist plot
-    value --> the sepcific value to locate in a matplotlib histogramm
-    it returns the index value in bins where value is located'''
-    # set the index counter
-    count = 0
-    # playing for loop in bins list
-    value_bin_ind = count
-    for b in bins:
-        if value > b:
-            value_bin_ind = count
-        count+=1
-    return value_bin_ind
-
-# ------------ Set base configuration for streamlit -------
-st.set_page_config(layout="wide")
+## Function to record the duration of the whole rerun and display the performance panel (admin) ##
+def end_rerun():
+    perf_monitor.record('rerun_total', (time.perf_counter() - rerun_start) * 1000, session_id)
+    if perf_panel:
+        st.sidebar.write('### Performances')
+        st.sidebar.write(f'Version des données: {assets.version} ({len(get_assets_registry().applied)} mises à jour appliquées)')
+        for update_name, update_error in get_assets_registry().errors.items():
+            st.sidebar.write(f'Mise à jour non appliquée {update_name}: {update_error}')
+        st.sidebar.write('Cette session (ms / MB):')
+        st.sidebar.dataframe(perf_monitor.summary(session_id))
+        st.sidebar.write('Toutes les sessions (ms / MB):')
+        st.sidebar.dataframe(perf_monitor.summary())
+        st.sidebar.download_button('Exporter en JSON', perf_monitor.to_json(), 'perf_dashboard.json', 'application/json')
+        st.sidebar.download_button('Exporter en CSV', perf_monitor.to_csv(), 'perf_dashboard.csv', 'text/csv')
 
 # ------------ Sidebar configuration ----------------------
 ## add side bar for user to interact ##
@@ -104,10 +149,14 @@ selected_credit = st.sidebar.selectbox('Prêt_ID', loan_id)
 ### Add checkbox for displaying different client informations ###
 client_data = st.sidebar.checkbox('Données client')
 client_pred_score = st.sidebar.checkbox('Résultat de la demande de prêt')
+### select if the score comes from the API model or from the model run locally ###
+scoring_backend = st.sidebar.radio('Calcul du score', SCORING_BACKENDS, DEFAULT_BACKEND)
 ### Add checkbox for displaying score interpretation ###
 score_interpret = st.sidebar.checkbox('Interprétations du score')
 ### Add checkbox for displaying client data analysis ###
 client_analysis = st.sidebar.checkbox('Analyse des features client')
+### Add checkbox for the performance panel (admin only) ###
+perf_panel = os.environ.get('DASHBOARD_ADMIN', '0') == '1' and st.sidebar.checkbox('Performances (admin)')
 
 
 # ------------ Main display, part by part -----------------
@@ -117,10 +166,11 @@ st.write("## **Classification d'une demande de crédit**")
 
 ## Display input dataframe with multiselection of features for all the passenger list available (data are not standard scaled here!) ##
 st.write('### Informations générales clients (index = ID de la demande de prêt):')
-st.write('Dimension des données: ' + str(df_test_sample_origin.shape[0]) + ' lignes ' + str(df_test_sample_origin.shape[1]) + ' colonnes')
-selections = st.multiselect('Vous pouvez ajouter ou enlever une donnée présente dans cette liste:', df_test_sample_origin.columns.tolist(),
- df_test_sample_origin.columns.tolist()[0:10])
-st.dataframe(df_test_sample_origin.loc[:,selections].sort_index())
+st.write('Dimension des données: ' + str(len(df_test_sample)) + ' lignes ' + str(len(features)) + ' colonnes')
+selections = st.multiselect('Vous pouvez ajouter ou enlever une donnée présente dans cette liste:', features.tolist(),
+ features.tolist()[0:10])
+### only the selected columns are read and scaled back (origin values) ###
+st.dataframe(assets.origin_columns(selections).sort_index())
 ### add expander for further explanations on the data ###
 with st.expander('Informations complémentaires'):
     st.write(""" Ici vous trouvez les informations disponibles pour tous les clients.  \n"""
@@ -130,23 +180,27 @@ with st.expander('Informations complémentaires'):
 if client_data:
     st.write(f'### Données du client, demande {selected_credit}')
     ### define values to display for the barchart and client data (with a maximum at 5) ###
-    selections_client0 = st.multiselect('Vous pouvez afficher 5 données maximum parmi cette liste:', df_test_sample[features].columns.tolist(),
-    df_test_sample[features].columns.tolist()[0:2])
+    selections_client0 = st.multiselect('Vous pouvez afficher 5 données maximum parmi cette liste:', features.tolist(),
+    features.tolist()[0:2])
     ### define columns to split some visual in two ###
     col1, col2 = st.columns(2)
     ### Display client informations regarding selected features ###
-    col1.dataframe(df_test_sample_origin.loc[selected_credit, selections_client0])
+    col1.dataframe(assets.origin_columns(selections_client0).loc[selected_credit])
     ### define pyplot for col2 barchart with selected passenger informations with condition of the number of selected features ###
     if len(selections_client0) <= 5:
-        fig_client_info = plt.figure()
-        plt.title(f'Diagramme bar données ID: {selected_credit}')
-        sns.barplot(x=df_test_sample[features].loc[selected_credit, selections_client0].index, y=df_test_sample[features].loc[selected_credit, selections_client0].values)
-        plt.xlabel('Features')
-        plt.xticks(fontsize=8, rotation=45)
-        plt.ylabel('Valeur normalisée')
-        plt.yticks(fontsize=8)
-        #### Display the graph ####
-        col2.pyplot(fig_client_info, clear_figure=True)
+        def draw_client_info():
+            fig_client_info = plt.figure()
+            plt.title(f'Diagramme bar données ID: {selected_credit}')
+            sns.barplot(x=df_test_sample.loc[selected_credit, selections_client0].index, y=df_test_sample.loc[selected_credit, selections_client0].values)
+            plt.xlabel('Features')
+            plt.xticks(fontsize=8, rotation=45)
+            plt.ylabel('Valeur normalisée')
+            plt.yticks(fontsize=8)
+            return fig_client_info
+        #### Display the graph (drawn only if not already in the cache) ####
+        with perf_monitor.timer('figure_client_info', session_id):
+            col2.image(figure_cache.png(('client_info', selected_credit, tuple(selections_client0), assets.version), draw_client_info),
+            use_column_width=True)
     else:
         col2.write("Vous avez sélectionné trop de feature!!! Le graphique n'est pas affiché")
     ### add expander for further explanations on the selected client data ###
@@ -157,16 +211,32 @@ if client_data:
 ## Display loan answer regarding model probability calcul (path through API Flask to get the result / checbox condition : 'Résultat de la demande de prêt') ##
 if client_pred_score:
     st.write('### Décision sur la demande de prêt')
-    ### careful the url of the API should be change for serial deployment!! ###
-    url_api_model_result = 'https://api-home-risk-oc-7.herokuapp.com/scores'
-    ### Be careful to the params, with must have a dict with index / ID loan value. It is how it is implemented in our API ###
-    get_request = requests.get(url=url_api_model_result, params={'index': selected_credit})
+    ### get the score from the API through the shared client (pooled connections, timeout and cache) or from the local model ###
+    if scoring_backend == 'Local':
+        scoring_client = get_local_scorer(assets)
+    else:
+        scoring_client = get_scoring_client()
+    try:
+        with perf_monitor.timer(f'score_{scoring_backend}', session_id):
+            score = scoring_client.score(selected_credit)
+    except requests.RequestException as e:
+        st.error(f"L'API de prédiction ne répond pas, merci de réessayer plus tard ({e.__class__.__name__})")
+        ### the slowest reruns (API timeouts) are also measured ###
+        end_rerun()
+        st.stop()
+    ### score in background the next loans of the list, usually looked at just after ###
+    position_credit = loan_id.get_loc(selected_credit)
+    scoring_client.prefetch_async(loan_id[position_credit + 1:position_credit + 1 + N_PREFETCH].tolist())
     ### We get  the prediction information from the json format of the API model ###
-    prediction_value = get_request.json()['Credit_score']
+    prediction_value = score.credit_score
     ### We get the answer regardin loan acceptation ###
-    answer_value = bool(get_request.json()['Answer'])
+    answer_value = score.answer
     ### Display results ###
     st.write(f'Demande de prêt ID: {selected_credit}')
+    if scoring_backend == 'Local':
+        max_difference, parity = get_local_parity(assets)
+        st.caption(f'Score calculé localement (écart maximum avec TARGET_PROB: {max_difference:.2e}'
+        + ('' if parity else ' → modèle local différent du modèle de référence!') + ')')
     st.write(f'Probabilité de défaut de remboursement: {prediction_value*100:.2f} %')
     if answer_value:
         st.write('Demande de prêt acceptée!')
@@ -205,18 +275,23 @@ if client_pred_score:
 ## Display interpretation about the score, global and local features importances (using SHAP library and SHAP model / checkbox: 'Interprétation du score' ) ##
 if score_interpret:
     st.write('### Interprétations du score')
-    ### calcul shap values with the explainer ###
-    shap_values =shap_explainer.shap_values(df_test_sample[features])
+    ### get shap values from the store (computed once per data/model version) ###
+    with perf_monitor.timer('shap_values', session_id):
+        shap_store = get_shap_store(assets)
     ### select between violin or bar plot for global features importance ###
     st.write('#### *Importance globale des features*')
     selected_global_shap = st.selectbox("Sélectionner un graphique",
     ['Graphique_en_violon', 'Graphique_en_baton'])
     #### plot graphic in function of the selectbox ####
+    #### the global summary only depends on the data version, it is drawn once for all the sessions ####
     if selected_global_shap == 'Graphique_en_violon':
-        figure_shap_glob_v = plt.figure(figsize=(10,10))
-        shap.summary_plot(shap_values[1], df_test_sample[features], feature_names=features, 
-        show=False, plot_size=None)
-        st.pyplot(figure_shap_glob_v, clear_figure=True)
+        def draw_shap_glob_v():
+            figure_shap_glob_v = plt.figure(figsize=(10,10))
+            shap.summary_plot(shap_store.class_values(1), df_test_sample[features], feature_names=features, 
+            show=False, plot_size=None)
+            return figure_shap_glob_v
+        with perf_monitor.timer('figure_shap_summary', session_id):
+            st.image(figure_cache.png(('shap_summary_violin', assets.version), draw_shap_glob_v), use_column_width=True)
         ##### add expander for futher explanations on the graphic #####
         with st.expander('Informations complémentaires'):
             st.write(""" Dans ce graphique en violon, on affiche par ordre d'importance les 20 features 
@@ -225,10 +300,13 @@ if score_interpret:
              en revanche à droite elles vont dans le sens d'augmenter le score (de refuser un prêt).  \n """ 
              """ Le code couleur indique la valeur de la feature. Une valeur élevée en rouge et une valeur faible en bleu. """)
     elif selected_global_shap == 'Graphique_en_baton':
-        figure_shap_glob_b = plt.figure(figsize=(10,10))
-        shap.summary_plot(shap_values[1], df_test_sample[features], feature_names=features, 
-        show=False, plot_size=None, plot_type = 'bar')
-        st.pyplot(figure_shap_glob_b, clear_figure=True)
+        def draw_shap_glob_b():
+            figure_shap_glob_b = plt.figure(figsize=(10,10))
+            shap.summary_plot(shap_store.class_values(1), df_test_sample[features], feature_names=features, 
+            show=False, plot_size=None, plot_type = 'bar')
+            return figure_shap_glob_b
+        with perf_monitor.timer('figure_shap_summary', session_id):
+            st.image(figure_cache.png(('shap_summary_bar', assets.version), draw_shap_glob_b), use_column_width=True)
         #### add expander for futher explanations on the graphic ####
         with st.expander('Informations complémentaires'):
             st.write(""" Dans ce graphique en bâton, on affiche par ordre d'importance les 20 features qui ont
@@ -237,18 +315,20 @@ if score_interpret:
     ### Waterfall plot for local features importance ###
     st.write('#### *Importance locale des features*')
     st.write('Graphique en cascade')
-    #### define client raw with index of the ID and get specific shap values for it ####
-    index_client0 = df_test_sample.index.get_loc(selected_credit)
-    choosen_raw = df_test_sample.loc[df_test_sample.index == selected_credit][features]
-    #### define ShapObject class to plot our waterfall for the selected client ####
-    shap_object = ShapObject(base_values = shap_explainer.expected_value[1],
-                         values = shap_explainer.shap_values(df_test_sample[features])[1][index_client0, :],
-                         feature_names = features,
-                         data = (choosen_raw.to_numpy().reshape(-1, 1)))
-    #### plot graphic
-    figure_loc_wtf = plt.figure(figsize=(10,10), facecolor='w')
-    shap.waterfall_plot(shap_object)
-    st.pyplot(figure_loc_wtf, clear_figure=True)
+    def draw_loc_wtf():
+        #### define client raw with index of the ID and get specific shap values for it ####
+        choosen_raw = df_test_sample.loc[df_test_sample.index == selected_credit][features]
+        #### define ShapObject class to plot our waterfall for the selected client ####
+        shap_object = ShapObject(base_values = shap_store.expected_value[1],
+                             values = shap_store.row(selected_credit, 1),
+                             feature_names = features,
+                             data = (choosen_raw.to_numpy().reshape(-1, 1)))
+        #### plot graphic
+        figure_loc_wtf = plt.figure(figsize=(10,10), facecolor='w')
+        shap.waterfall_plot(shap_object)
+        return figure_loc_wtf
+    with perf_monitor.timer('figure_shap_waterfall', session_id):
+        st.image(figure_cache.png(('shap_waterfall', selected_credit, assets.version), draw_loc_wtf), use_column_width=True)
     #### add expander for further explanations on the graphic ####
     with st.expander('Informations complémentaires'):
             st.write(""" Dans ce graphique en cascade, on affiche par ordre d'importance les features 
@@ -261,49 +341,40 @@ if score_interpret:
 if client_analysis:
     st.write('### Analyse des features clients')
     ### add slider to select the number of near client that we want to select ###
-    nearest_number = st.slider('Sélectionner le nombre de clients proche', 10, 40, None, 10)
-    ### calculate the dataframe for near client ###
-    df_nearest_client = filter_near_customer(df_test_sample, selected_credit, nearest_number, 'TARGET_PROB')
+    nearest_number = st.slider('Sélectionner le nombre de clients proche', 10, 40, None, 1)
+    ### select how near clients are defined: neighbours in score order or nearest score values ###
+    nearest_method = st.selectbox('Méthode de sélection des clients proches', ['Rang du score', 'Écart de score', 'Similarité des features'])
+    if nearest_method == 'Similarité des features':
+        #### select the distance and the features used to define similar clients, the tree is built only once validated ####
+        with st.form('similarity_form'):
+            col_metric, col_feat = st.columns([1, 3])
+            nearest_metric = col_metric.selectbox('Distance', METRICS)
+            nearest_features = col_feat.multiselect('Features utilisées pour la similarité', features.tolist(), features.tolist())
+            st.form_submit_button('Appliquer')
+        if len(nearest_features) == 0:
+            nearest_features = features.tolist()
+        #### calculate the dataframe for similar client with the tree built once ####
+        with perf_monitor.timer('clients_similaires', session_id):
+            df_nearest_client = filter_similar_customer(df_test_sample, selected_credit, nearest_number,
+            get_feature_index(assets, nearest_metric, tuple(nearest_features)))
+    else:
+        ### calculate the dataframe for near client with the rank index built once ###
+        with perf_monitor.timer('filter_near_customer', session_id):
+            df_nearest_client = filter_near_customer(df_test_sample, selected_credit, nearest_number, 'TARGET_PROB',
+            rank_index=get_rank_index(assets), method='window' if nearest_method == 'Rang du score' else 'distance')
+    ### near clients identify the figures in the cache ###
+    nearest_key = tuple(df_nearest_client.index.tolist())
     ### bivariate analysis where we can choose the features to plot ###
     st.write('#### *Analyse bivariée*')
     #### define columns to split for several selection box ####
     col11, col12 = st.columns(2)
     feat1 = col11.selectbox('Feature 1', features, 0)
     feat2 = col12.selectbox('Feature 2', features, 1)
-    #### Plot scatter plot with plotly ####
-    figure_biv = go.Figure()
-    #### all client scatter filtered with PREDICT_PROB column and treshold (accepted / denied) ####
-    figure_biv.add_trace(go.Scatter(x=df_test_sample.loc[df_test_sample['TARGET_PROB'] < treshold][feat1], 
-    y=df_test_sample.loc[df_test_sample['TARGET_PROB'] < treshold][feat2], 
-    mode='markers', name='Tous les clients_prêt_acceptés', marker_symbol='circle', 
-    marker={'color': df_test_sample.loc[df_test_sample['TARGET_PROB'] < treshold]['TARGET_PROB'], 
-                            'coloraxis':'coloraxis'}))
-    figure_biv.add_trace(go.Scatter(x=df_test_sample.loc[df_test_sample['TARGET_PROB'] >= treshold][feat1], 
-    y=df_test_sample.loc[df_test_sample['TARGET_PROB'] >= treshold][feat2], 
-    mode='markers', name='Tous les clients_prêt_refusés', marker_symbol='x', 
-    marker={'color': df_test_sample.loc[df_test_sample['TARGET_PROB'] >= treshold]['TARGET_PROB'], 
-                            'coloraxis':'coloraxis'}))
-    #### neat customer scatter filtered with PREDICT_PROB column and treshold (accepted / denied) ####
-    figure_biv.add_trace(go.Scatter(x=df_nearest_client.loc[df_nearest_client['TARGET_PROB'] < treshold][feat1], 
-    y=df_nearest_client.loc[df_nearest_client['TARGET_PROB']< treshold][feat2], 
-    mode='markers', name='clients_similaires_prêt_acceptés', marker_symbol='circle', 
-    marker={'color': df_nearest_client.loc[df_nearest_client['TARGET_PROB'] < treshold]['TARGET_PROB'],
-                             'coloraxis':'coloraxis'}))
-    figure_biv.add_trace(go.Scatter(x=df_nearest_client.loc[df_nearest_client['TARGET_PROB'] >= treshold][feat1], 
-    y=df_nearest_client.loc[df_nearest_client['TARGET_PROB'] >= treshold][feat2], 
-    mode='markers', name='clients_similaires_prêt_refusés', marker_symbol='x', 
-    marker={'color':df_nearest_client.loc[df_nearest_client['TARGET_PROB'] >= treshold]['TARGET_PROB'], 
-                            'coloraxis':'coloraxis'}))
-    #### plot selected client point ####
-    figure_biv.add_trace(go.Scatter(x=[df_test_sample.loc[selected_credit, feat1]], y= [df_test_sample.loc[selected_credit, feat2]],
-    mode='markers', name='ID_prêt_client_selectionné', 
-    marker={'size':20, 'color':[df_test_sample.loc[selected_credit, 'TARGET_PROB']], 'coloraxis':'coloraxis', 
-    'line':{'width':3, 'color':'black'}}))
-    #### update legend localisation and add colorbar ####
-    figure_biv.update_layout(legend={'orientation':"h", 'yanchor':'bottom','y':1.05, 'xanchor':'right','x':1, 
-    'bgcolor':'white', 'font':{'color':'black'}}, xaxis={'title':feat1}, 
-    yaxis={'title':feat2}, coloraxis={'colorbar':{'title':'Score'}, 
-                                        'colorscale':'RdYlGn_r', 'cmin':0, 'cmax':1, 'showscale':True})
+    def build_biv():
+        #### Plot scatter plot with plotly (WebGL, population downsampled above a number of points) ####
+        return bivariate_figure(df_test_sample, df_nearest_client, selected_credit, feat1, feat2, 'TARGET_PROB', treshold)
+    with perf_monitor.timer('figure_bivariee', session_id):
+        figure_biv = figure_cache.plotly(('bivariate', selected_credit, feat1, feat2, nearest_key, treshold, assets.version), build_biv)
     st.plotly_chart(figure_biv, use_container_width=True)
     #### add expander for further explanations on the scatterplot ####
     with st.expander('Informations complémentaires'):
@@ -317,33 +388,40 @@ if client_analysis:
     selected_anaysis_gh = st.selectbox('Sélectionner un graphique', ['Boxplot', 'Histogramme/bâton'])
     if selected_anaysis_gh == 'Boxplot':
         ##### Add the possibility to display several features on the same plot #####
-        selections_analysis = st.multiselect('Vous pouvez ajouter ou enlever une donnée présente dans cette liste:', df_test_sample[features].columns.tolist(),
-        df_test_sample[features].columns.tolist()[0:5])
-        ##### display boxplot #####
-        ###### create in each df a columns to identifie them and use hue parameters ######
-        df_test_sample['data_origin'] = 'Tous les clients'
-        df_nearest_client['data_origin'] = 'clients_similaires'
-        ###### concatenate two df before drawing boxplot ######
-        cdf = pd.concat([df_test_sample[selections_analysis + ['data_origin']], 
-        df_nearest_client[selections_analysis + ['data_origin']]])
-        ###### Create DataFrame from the selected client loan ID series ######
-        df_loan = pd.DataFrame([df_test_sample.loc[selected_credit, features].tolist()], columns=features)
-        ###### using melt mehtod to adapt our concatenate dataframe to the format that we want (for displaying several features) with Seaborn ######
-        cdf = pd.melt(cdf, id_vars='data_origin', var_name='Features')
-        df_loan = pd.melt(df_loan[selections_analysis], var_name='Features')
-        df_loan['data_origin'] = 'ID_prêt_client_selectionné'
-        ###### plotting figure ######
-        figure_boxplot = plt.figure(figsize=(4,2))
-        ax = sns.boxplot(x = 'Features', y = 'value', hue='data_origin', data=cdf , showfliers=False, palette = 'tab10')
-        sns.stripplot(x = 'Features', y = 'value', data = df_loan, hue = 'data_origin', palette=['yellow'], s=8, linewidth=1.5, edgecolor='black')
-        plt.xticks(fontsize=6, rotation=45)
-        plt.yticks(fontsize=6)
-        plt.ylabel('Valeur normalisée')
-        leg = plt.legend( bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
-        ###### modify legend object for selected client loan ID to match graph style ######
-        leg.legendHandles[-1].set_linewidth(1.5)
-        leg.legendHandles[-1].set_edgecolor('black')
-        st.pyplot(figure_boxplot, clear_figure=True)
+        selections_analysis = st.multiselect('Vous pouvez ajouter ou enlever une donnée présente dans cette liste:', features.tolist(),
+        features.tolist()[0:5])
+        def draw_boxplot():
+            ##### display boxplot #####
+            ###### population statistics are precomputed, only the near clients ones are computed here (no copy of the data) ######
+            box_stats_table = get_box_stats_table(assets)
+            groups = [box_stats_table.population_stats(selections_analysis, 'Tous les clients'),
+            box_stats_table.group_stats(df_nearest_client, selections_analysis, 'clients_similaires')]
+            ###### plotting figure, careful colors and positions are matching the seaborn ones (tab10 palette, hue dodge) ######
+            figure_boxplot = plt.figure(figsize=(4,2))
+            ax = plt.gca()
+            colors = sns.color_palette('tab10')
+            positions = np.arange(len(selections_analysis))
+            for i, group_stats in enumerate(groups):
+                ax.bxp(group_stats, positions=positions + (i - 0.5) * 0.4, widths=0.32, showfliers=False, patch_artist=True,
+                boxprops={'facecolor': colors[i]}, medianprops={'color': 'black'})
+            ###### selected client loan ID values ######
+            ax.scatter(positions, df_test_sample.loc[selected_credit, selections_analysis].to_numpy(dtype=float), s=8**2, c='yellow',
+            linewidth=1.5, edgecolor='black', zorder=3)
+            ax.set_xticks(positions)
+            ax.set_xticklabels(selections_analysis)
+            plt.xticks(fontsize=6, rotation=45)
+            plt.yticks(fontsize=6)
+            plt.xlabel('Features')
+            plt.ylabel('Valeur normalisée')
+            ###### legend for the two groups and the selected client loan ID (same style as the graph) ######
+            handles = [Patch(facecolor=colors[0], label='Tous les clients'), Patch(facecolor=colors[1], label='clients_similaires'),
+            Line2D([], [], marker='o', linestyle='', markersize=8, markerfacecolor='yellow', markeredgewidth=1.5,
+            markeredgecolor='black', label='ID_prêt_client_selectionné')]
+            plt.legend(handles=handles, bbox_to_anchor=(1.05, 1), loc=2, borderaxespad=0.)
+            return figure_boxplot
+        with perf_monitor.timer('figure_boxplot', session_id):
+            st.image(figure_cache.png(('boxplot', selected_credit, tuple(selections_analysis), nearest_key, assets.version), draw_boxplot),
+            use_column_width=True)
         ###### add expander for further explanations on the scatterplot ######
         with st.expander('Informations complémentaires'):
             st.write(""" Ce boxplot permet d'afficher les distributions des groupes de clients en fonction de la valeur du client sélectionné.  \n"""
@@ -351,31 +429,42 @@ if client_analysis:
     if selected_anaysis_gh == 'Histogramme/bâton':
         ##### Add the posibility to choose the distribution we want to see #####
         feat3 = st.selectbox('Feature', features,0)
-        loan = df_test_sample.loc[selected_credit, :]
-        figure_h=plt.figure(figsize=(10,4))
-        figure_h.add_subplot(1,2,1)
-        plt.title('Tous les clients', fontweight='bold')
-        ###### careful, color used here for bins are maching seaborn previous ones used ######
-        n, bins, patches = plt.hist(x = df_test_sample[feat3], color='#1f77b4', linewidth=1, edgecolor='black')
-        ###### here we are setting the color bins for our selected loan customer ######
-        patches[bin_location(bins, loan[feat3])].set_fc('yellow')
-        plt.xlabel(f'{feat3} (Normalisé)')
-        plt.xticks(bins, fontsize=8, rotation=45)
-        plt.ylabel('Nombre total')
-        plt.yticks(fontsize=8)
-        figure_h.add_subplot(1,2,2)
-        plt.title('Clients similaires', fontweight='bold')
-        n, bins, patches = plt.hist(x = df_nearest_client[feat3], color='#ff7f0e', linewidth=1, edgecolor='black')
-        patches[bin_location(bins, loan[feat3])].set_fc('yellow')
-        plt.xlabel(f'{feat3} (Normalisé)')
-        plt.xticks(bins, fontsize=8, rotation=45)
-        plt.ylabel('Nombre Total')
-        plt.yticks(fontsize=8)
-        st.pyplot(figure_h, clear_figure=True)
+        def draw_h():
+            loan = df_test_sample.loc[selected_credit, :]
+            ###### population and similar clients use the same bins (precomputed) so that the two plots can be compared ######
+            binning_table = get_binning_table(assets)
+            bins = binning_table.bins(feat3)
+            loan_bin = bin_location(bins, loan[feat3])
+            figure_h=plt.figure(figsize=(10,4))
+            figure_h.add_subplot(1,2,1)
+            plt.title('Tous les clients', fontweight='bold')
+            ###### careful, color used here for bins are maching seaborn previous ones used ######
+            n, bins, patches = plt.hist(x = bins[:-1], bins=bins, weights=binning_table.population_counts(feat3),
+            color='#1f77b4', linewidth=1, edgecolor='black')
+            ###### here we are setting the color bins for our selected loan customer ######
+            patches[loan_bin].set_fc('yellow')
+            plt.xlabel(f'{feat3} (Normalisé)')
+            plt.xticks(bins, fontsize=8, rotation=45)
+            plt.ylabel('Nombre total')
+            plt.yticks(fontsize=8)
+            figure_h.add_subplot(1,2,2)
+            plt.title('Clients similaires', fontweight='bold')
+            n, bins, patches = plt.hist(x = bins[:-1], bins=bins, weights=binning_table.group_counts(feat3, df_nearest_client[feat3]),
+            color='#ff7f0e', linewidth=1, edgecolor='black')
+            patches[loan_bin].set_fc('yellow')
+            plt.xlabel(f'{feat3} (Normalisé)')
+            plt.xticks(bins, fontsize=8, rotation=45)
+            plt.ylabel('Nombre Total')
+            plt.yticks(fontsize=8)
+            return figure_h
+        with perf_monitor.timer('figure_histogramme', session_id):
+            st.image(figure_cache.png(('histogram', selected_credit, feat3, nearest_key, assets.version), draw_h), use_column_width=True)
         ###### add expander for further explanations on the scatterplot ######
         with st.expander('Informations complémentaires'):
             st.write(""" Cette histogramme permet d'afficher les distributions des groupes de clients.  \n"""
             """ Notez que la barre en jaune indique dans quel population de nos groupes de clients 
             se trouve notre client sélectionné.  \n """
             """ Les variables sont également normalisées. """)
-    
+
+## Record the duration of the whole rerun and display the performance panel ##
+end_rerun()
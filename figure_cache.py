@@ -0,0 +1,37 @@
+# ------------ Libraries import ---------------------------
+import io
+import matplotlib.pyplot as plt
+import plotly.io as pio
+from lru_cache import LRUCache
+
+# ------------ Function and class used to cache rendered figures -
+## Class Object to keep rendered figures (PNG bytes or plotly JSON) with a size bound, least recently used are dropped ##
+class FigureCache(LRUCache):
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        '''--> max_bytes: maximum total size of the figures kept in memory'''
+        super().__init__(max_bytes, weight=len)
+
+    def png(self, key, draw, dpi=200):
+        '''Function to get a matplotlib figure as PNG bytes, drawn only if it is not already in the cache
+        --> key: tuple identifying the figure (section, loan ID, selected features, ..., data version)
+        --> draw: function without argument drawing and returning the matplotlib figure'''
+        value = self.get(key)
+        if value is None:
+            figure = draw()
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+            plt.close(figure)
+            value = buffer.getvalue()
+            self.set(key, value)
+        return value
+
+    def plotly(self, key, build):
+        '''Function to get a plotly figure, built only if its JSON is not already in the cache
+        --> key: tuple identifying the figure (section, loan ID, selected features, ..., data version)
+        --> build: function without argument returning the plotly figure'''
+        value = self.get(key)
+        if value is None:
+            value = build().to_json().encode()
+            self.set(key, value)
+        return pio.from_json(value.decode())
@@ -0,0 +1,138 @@
+# ------------ Libraries import ---------------------------
+import hashlib
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from column_store import MANIFEST, load_frame
+
+# ------------ Default asset files used by the dashboard --
+### data can be a CSV file or a column store folder (see column_store.py), set with HOME_RISK_DATA environment variable ###
+DATA_PATH = os.environ.get('HOME_RISK_DATA', r'test_sample_data_home_risk.csv')
+### downcast the data to float32 when HOME_RISK_FLOAT32=1 ###
+FLOAT32 = os.environ.get('HOME_RISK_FLOAT32', '0') == '1'
+SCALER_PATH = r'std_scaler_home_risk.pkl'
+EXPLAINER_PATH = r'shap_tree_explainer_lgbm_model.pkl'
+### last feature of the data file is a probability (will be used for visualization purpose) ###
+TARGET = 'TARGET_PROB'
+
+## cache of content hashes, keyed by path and only recomputed when the file stat changes ##
+_hash_cache = {}
+
+# ------------ Function and class used to load the assets -
+## Function to get the content hash of a file without rereading it at each rerun ##
+def file_hash(path, chunk_size=1 << 20):
+    '''Function to compute the sha256 content hash of a file.
+    The hash is kept in memory and only recomputed when the size or the modification time of the file changes
+    --> path: path of the file to hash
+    --> chunk_size: number of bytes read at once
+    it returns the hexadecimal digest of the file content'''
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _hash_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    _hash_cache[path] = (key, digest.hexdigest())
+    return digest.hexdigest()
+
+## Function to get a single version string for all the assets ##
+def assets_version(data_path=DATA_PATH, scaler_path=SCALER_PATH, explainer_path=EXPLAINER_PATH, float32=FLOAT32):
+    '''Function to build the version of the assets from the content hash of each file.
+    The version changes as soon as one of the files changes on disk, it is used as cache key
+    (for a column store folder the manifest is hashed, it contains the hash of the source CSV)
+    --> float32: the data is downcast to float32, its shap values and figures are then cached apart
+    it returns a short hexadecimal string'''
+    if os.path.isdir(data_path):
+        data_path = os.path.join(data_path, MANIFEST)
+    digest = hashlib.sha256()
+    for path in (data_path, scaler_path, explainer_path):
+        digest.update(file_hash(path).encode())
+    if float32:
+        digest.update(b'float32')
+    return digest.hexdigest()[:16]
+
+## Function to load a pickled object ##
+def load_pickle(path):
+    '''Function to load a pickled object (standard scaler or shap explainer) and close the file after reading'''
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+## Class Object with all the data and models shared by the dashboard sessions ##
+class HomeRiskAssets:
+
+    def __init__(self, version, df_test_sample, std_scaler, shap_explainer, target=TARGET, df_test_sample_origin=None, loan_id=None):
+        ### version of the assets (content hash of the files) ###
+        self.version = version
+        ### standard scaled data with the probability as last column ###
+        self.df_test_sample = df_test_sample
+        ### features column name (all columns except the probability) ###
+        self.features = df_test_sample.columns[: -1]
+        ### sorted loan ID for the selection box (given when they are updated incrementally) ###
+        self.loan_id = df_test_sample.index.sort_values() if loan_id is None else loan_id
+        self.target = target
+        self.std_scaler = std_scaler
+        self.shap_explainer = shap_explainer
+        ### structures derived from this version (shap store, rank index, ...), built once when first needed ###
+        self.derived = {}
+        ### origin sample values (not standard scaled), given when they are updated incrementally ###
+        if df_test_sample_origin is not None:
+            self.derived['df_test_sample_origin'] = df_test_sample_origin
+        ### one lock per structure, so that a long build (shap values) does not block the other ones ###
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def derived_value(self, name, build):
+        '''Function to get a structure derived from the assets, built only the first time it is asked
+        --> name: name of the structure (any hashable, e.g. a tuple with its parameters)
+        --> build: function without argument building the structure'''
+        with self._lock:
+            if name in self.derived:
+                return self.derived[name]
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            ### another session may have built it while this one was waiting ###
+            if name not in self.derived:
+                self.derived[name] = build()
+            return self.derived[name]
+
+    @property
+    def df_test_sample_origin(self):
+        '''Origin sample values (not standard scaled) of all the features, computed the first time they are used'''
+        return self.derived_value('df_test_sample_origin', lambda: pd.DataFrame(
+        self.std_scaler.inverse_transform(self.df_test_sample[self.features]), index=self.df_test_sample.index, columns=self.features))
+
+    def origin_columns(self, columns):
+        '''Function to get the origin values (not standard scaled) of some features only.
+        When all the origin values are not computed yet, only these columns are read and scaled back
+        --> columns: list of features column name'''
+        if 'df_test_sample_origin' in self.derived:
+            return self.derived['df_test_sample_origin'].loc[:, columns]
+        positions = self.features.get_indexer(columns)
+        X = self.df_test_sample.loc[:, columns].to_numpy(dtype=np.float64)
+        ### same operations as StandardScaler.inverse_transform, column by column ###
+        if getattr(self.std_scaler, 'scale_', None) is not None:
+            X = X * self.std_scaler.scale_[positions]
+        if getattr(self.std_scaler, 'with_mean', True):
+            X = X + self.std_scaler.mean_[positions]
+        return pd.DataFrame(X, index=self.df_test_sample.index, columns=columns)
+
+## Function to load all the assets in one call ##
+def load_assets(data_path=DATA_PATH, scaler_path=SCALER_PATH, explainer_path=EXPLAINER_PATH, version=None, float32=FLOAT32):
+    '''Function to load the data, the standard scaler and the shap explainer and derive the origin sample values.
+    The returned object is meant to be shared read-only between all the sessions
+    --> data_path: CSV data file or column store folder
+    --> version: version of the assets, computed from the files content if not given
+    --> float32: downcast the data to float32 to halve its memory
+    it returns a HomeRiskAssets object'''
+    if version is None:
+        version = assets_version(data_path, scaler_path, explainer_path, float32)
+    df_test_sample = load_frame(data_path, float32=float32)
+    std_scaler = load_pickle(scaler_path)
+    ### shap tree explainer for our lgbm model (should be changed if our model is update!!) ###
+    shap_explainer = load_pickle(explainer_path)
+    return HomeRiskAssets(version, df_test_sample, std_scaler, shap_explainer)
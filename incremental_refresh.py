@@ -0,0 +1,128 @@
+# ------------ Libraries import ---------------------------
+import hashlib
+import os
+import threading
+import time
+import pandas as pd
+from home_risk_assets import HomeRiskAssets, assets_version, file_hash, load_assets
+from column_store import MANIFEST, load_frame
+from shap_store import clean_shap_cache, update_shap_store
+
+## folder where new or updated loans are dropped (CSV files or column store folders), applied in name order ##
+UPDATES_DIR = os.environ.get('HOME_RISK_UPDATES', r'updates')
+## minimum number of seconds between two checks of the updates folder ##
+POLL_INTERVAL = 30
+
+# ------------ Function and class used to refresh the data without restart -
+## Function to insert or replace loans in a dataframe ##
+def upsert(df, df_update):
+    '''Function to get a new dataframe with the loans of df_update added or replaced, df is not modified.
+    Previous loans keep their position (updated in place) and new loans are added at the end
+    --> df: dataframe indexed by loan ID
+    --> df_update: dataframe with the same columns and the new or updated loans'''
+    is_update = df_update.index.isin(df.index)
+    df_new = pd.concat([df, df_update[~is_update]])
+    df_new.loc[df_update.index[is_update], :] = df_update[is_update].to_numpy()
+    return df_new
+
+## Function to build the next version of the assets from new or updated loans ##
+def apply_update(assets, df_update, update_version):
+    '''Function to get a new assets version where only the parts affected by the loans of df_update are computed:
+    origin values, sorted loan ID, shap values, rank index and histogram bins (when they were already built)
+    --> assets: HomeRiskAssets of the current version (not modified, open sessions keep using it)
+    --> df_update: dataframe with the new or updated loans (same columns as the data file)
+    --> update_version: hash identifying the update
+    it returns a HomeRiskAssets object (assets itself when the update has no loan)'''
+    df = assets.df_test_sample
+    ### same columns and types as the data, if a loan is several times in the update the last one is kept ###
+    df_update = df_update[df.columns].astype(df.dtypes.to_dict())
+    df_update = df_update[~df_update.index.duplicated(keep='last')]
+    ### nothing to apply (e.g. header only file), the current version is kept ###
+    if df_update.empty:
+        return assets
+    changed_ids = df_update.index
+    version = hashlib.sha256((assets.version + update_version).encode()).hexdigest()[:16]
+    ### derived structures are updated only if they were built for the current version, otherwise built when needed ###
+    derived = dict(assets.derived)
+    df_origin = None
+    if 'df_test_sample_origin' in derived:
+        df_origin_update = pd.DataFrame(assets.std_scaler.inverse_transform(df_update[assets.features]),
+        index=changed_ids, columns=assets.features)
+        df_origin = upsert(derived['df_test_sample_origin'], df_origin_update)
+    new_assets = HomeRiskAssets(version, upsert(df, df_update), assets.std_scaler, assets.shap_explainer, assets.target,
+    df_origin, assets.loan_id.union(changed_ids))
+    if 'shap_store' in derived:
+        new_assets.derived['shap_store'] = update_shap_store(derived['shap_store'], new_assets, changed_ids)
+    if 'rank_index' in derived:
+        new_assets.derived['rank_index'] = derived['rank_index'].updated(new_assets.df_test_sample, assets.target, changed_ids)
+    if 'binning_table' in derived:
+        binning_table = derived['binning_table'].updated(df.loc[changed_ids[changed_ids.isin(df.index)]], df_update)
+        if binning_table is not None:
+            new_assets.derived['binning_table'] = binning_table
+    return new_assets
+
+## Class Object with the current assets version, refreshed with the updates folder ##
+class AssetsRegistry:
+
+    def __init__(self, updates_dir=UPDATES_DIR, poll_interval=POLL_INTERVAL):
+        '''--> updates_dir: folder where new or updated loans are dropped
+        --> poll_interval: minimum number of seconds between two checks of the folder'''
+        self.updates_dir = updates_dir
+        self.poll_interval = poll_interval
+        self._assets = None
+        self._base_version = None
+        ### updates already applied and updates which could not be applied (name --> error) ###
+        self.applied = []
+        self.errors = {}
+        self._last_poll = 0.
+        self._refresh_lock = threading.Lock()
+
+    def current(self):
+        '''Function to get the current assets version. A session must call it once per rerun and use the returned
+        object for the whole rerun, so that it sees a consistent snapshot even if a refresh happens meanwhile.
+        Only one session refreshes at a time, the others keep the current snapshot instead of waiting'''
+        if self._refresh_lock.acquire(blocking=self._assets is None):
+            try:
+                self._refresh()
+            finally:
+                self._refresh_lock.release()
+        return self._assets
+
+    def _refresh(self):
+        base_version = assets_version()
+        if base_version != self._base_version:
+            ### the base files changed on disk: full reload, then all the updates are applied again ###
+            self._assets = load_assets(version=base_version)
+            ### shap values of the previous base and of its updates (rebuilt from this base if needed) ###
+            clean_shap_cache(base_version)
+            self._base_version = base_version
+            self.applied, self.errors = [], {}
+            self._last_poll = 0.
+        if time.monotonic() - self._last_poll >= self.poll_interval:
+            self._last_poll = time.monotonic()
+            self._poll()
+
+    def _poll(self):
+        if not os.path.isdir(self.updates_dir):
+            return
+        for name in sorted(os.listdir(self.updates_dir)):
+            path = os.path.join(self.updates_dir, name)
+            if name in self.applied or name in self.errors or not (name.endswith('.csv') or os.path.isdir(path)):
+                continue
+            try:
+                update_version = file_hash(os.path.join(path, MANIFEST) if os.path.isdir(path) else path)
+                self._assets = apply_update(self._assets, load_frame(path), update_version)
+                self.applied.append(name)
+            except Exception as e:
+                ### a bad file is reported and skipped, it is not tried again at each poll ###
+                self.errors[name] = f'{e.__class__.__name__}: {e}'
+
+    def ingest(self, df_update, update_version):
+        '''Function to apply new or updated loans and publish the new version (swap of a single reference)
+        --> df_update: dataframe with the new or updated loans
+        --> update_version: hash identifying the update'''
+        with self._refresh_lock:
+            if self._assets is None:
+                self._refresh()
+            self._assets = apply_update(self._assets, df_update, update_version)
+            return self._assets
@@ -0,0 +1,73 @@
+# ------------ Libraries import ---------------------------
+import threading
+import time
+from collections import OrderedDict
+
+# ------------ Class used for the bounded caches of the dashboard -
+## Class Object for a thread safe cache with a maximum size, least recently used are dropped ##
+class LRUCache:
+
+    def __init__(self, maxsize, ttl=None, weight=None):
+        '''--> maxsize: maximum total weight of the values kept (their number by default)
+        --> ttl: time to live of the values in seconds, None to keep them until they are dropped
+        --> weight: function giving the weight of a value (e.g. len for bytes), 1 for each value by default'''
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weight = weight
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        ### key --> (time added, value, weight) ###
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _pop(self, key):
+        self.total -= self._data.pop(key)[2]
+
+    def get(self, key):
+        '''Function to get a value from the cache, None if the key is missing or expired'''
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[0] > self.ttl:
+                self._pop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, replace=True):
+        '''Function to add a value in the cache and drop the least recently used ones above maxsize
+        (the last value added is always kept, even if it is alone above maxsize)
+        --> replace: False to keep the value already in the cache for this key (e.g. built by a concurrent session)
+        it returns the value kept in the cache'''
+        weight = 1 if self.weight is None else self.weight(value)
+        with self._lock:
+            if key in self._data:
+                if not replace:
+                    self._data.move_to_end(key)
+                    return self._data[key][1]
+                self._pop(key)
+            self._data[key] = (time.monotonic(), value, weight)
+            self.total += weight
+            while self.total > self.maxsize and len(self._data) > 1:
+                self._pop(next(iter(self._data)))
+            return value
+
+    def get_or_build(self, key, build):
+        '''Function to get a value, built (outside the lock, so other keys are not blocked) if it is not in the cache
+        --> build: function without argument building the value'''
+        value = self.get(key)
+        if value is None:
+            value = self.set(key, build(), replace=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total = 0
@@ -0,0 +1,92 @@
+# ------------ Libraries import ---------------------------
+import numpy as np
+import pandas as pd
+
+# ------------ Function and class used to find near customers -
+## Class Object with customers sorted by probability, built once and used for every neighbour request ##
+class ProbabilityRankIndex:
+
+    def __init__(self, df, target):
+        ### sort once in decreasing probability (same order as the one displayed in the dashboard) ###
+        order = np.argsort(-df[target].to_numpy(), kind='mergesort')
+        ### loan ID sorted by probability, get_loc gives the rank position of a loan in constant time ###
+        self.sorted_id = df.index[order]
+        self.sorted_prob = df[target].to_numpy()[order]
+        ### position of each sorted row in the original dataframe ###
+        self.positions = order
+
+    @classmethod
+    def _from_arrays(cls, sorted_id, sorted_prob, positions):
+        rank_index = cls.__new__(cls)
+        rank_index.sorted_id, rank_index.sorted_prob, rank_index.positions = sorted_id, sorted_prob, positions
+        return rank_index
+
+    def updated(self, df, target, changed_ids):
+        '''Function to get the rank index of a new version of df without sorting it again:
+        updated loans are removed and new or updated loans are inserted at their rank
+        --> df: new dataframe (previous loans first, in the same order, new loans at the end)
+        --> changed_ids: Id of the new or updated loans
+        it returns a new ProbabilityRankIndex (this one is not modified, it can still be used by other sessions)'''
+        keep = ~self.sorted_id.isin(changed_ids)
+        sorted_id, sorted_prob, positions = self.sorted_id[keep], self.sorted_prob[keep], self.positions[keep]
+        new_positions = df.index.get_indexer(changed_ids)
+        new_prob = df[target].to_numpy()[new_positions]
+        order = np.argsort(-new_prob, kind='mergesort')
+        new_positions, new_prob = new_positions[order], new_prob[order]
+        ### probabilities are sorted in decreasing order, search in their opposite (increasing) ###
+        insert_at = np.searchsorted(-sorted_prob, -new_prob, side='right')
+        sorted_id = pd.Index(np.insert(sorted_id.to_numpy(), insert_at, df.index[new_positions].to_numpy()), name=df.index.name)
+        return self._from_arrays(sorted_id, np.insert(sorted_prob, insert_at, new_prob), np.insert(positions, insert_at, new_positions))
+
+    def __len__(self):
+        return len(self.sorted_id)
+
+    def rank(self, cust_id):
+        '''Function to get the rank position of a customer (0 is the highest probability)'''
+        return self.sorted_id.get_loc(cust_id)
+
+    def window(self, cust_id, n_near_cust):
+        '''Function to get the positions of the customer and its n_near_cust neighbours in probability order.
+        Neighbours are taken half up and half down, shifted when the customer is near the top or the bottom
+        --> cust_id: Id of a customer request
+        --> n_near_cust: number of nearest customer, odd numbers put the extra customer down
+        it returns a slice of the rank positions'''
+        index_cust = self.rank(cust_id)
+        size = min(n_near_cust + 1, len(self))
+        start = min(max(index_cust - n_near_cust // 2, 0), len(self) - size)
+        return slice(start, start + size)
+
+    def k_nearest(self, cust_id, n_near_cust):
+        '''Function to get the rank positions of the customer and its n_near_cust nearest customers
+        in terms of absolute probability distance (ordered by decreasing probability)
+        --> cust_id: Id of a customer request
+        --> n_near_cust: number of nearest customer'''
+        index_cust = self.rank(cust_id)
+        ### nearest customers are necessarily in the n_near_cust ranks up or down ###
+        start = max(index_cust - n_near_cust, 0)
+        stop = min(index_cust + n_near_cust + 1, len(self))
+        distance = np.abs(self.sorted_prob[start:stop] - self.sorted_prob[index_cust])
+        ### the customer itself is always kept (distance forced below 0) ###
+        distance[index_cust - start] = -1
+        nearest = np.argsort(distance, kind='mergesort')[:n_near_cust + 1]
+        return start + np.sort(nearest)
+
+## Function to filter dataset with nearest neighbors in terms of probability result ##
+def filter_near_customer(df, cust_id, n_near_cust, target, rank_index=None, method='window'):
+    ''' Function to filter dataframe regarding the nearest neighbors of our customer in terms of probability.
+    Note that the customer is included in the filtered DF
+    --> df: dataframe with all customer data, must have an ID for customer credit request
+    --> cust_id: Id of a customer request
+    --> n_near_cust: number of nearest customer to the id request (odd numbers are accepted)
+    --> target: must be an str, name of the column contaigning the probability
+    --> rank_index: ProbabilityRankIndex built on df, built here if not given (prefer to build it once)
+    --> method: 'window' for neighbours in rank order, 'distance' for nearest in absolute probability distance'''
+    if rank_index is None:
+        rank_index = ProbabilityRankIndex(df, target)
+    if method == 'window':
+        positions = rank_index.positions[rank_index.window(cust_id, n_near_cust)]
+    elif method == 'distance':
+        positions = rank_index.positions[rank_index.k_nearest(cust_id, n_near_cust)]
+    else:
+        raise ValueError(f"method must be 'window' or 'distance', not {method!r}")
+    return df.iloc[positions]
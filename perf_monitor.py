@@ -0,0 +1,101 @@
+# ------------ Libraries import ---------------------------
+import importlib
+import json
+import resource
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+## number of measures kept for each section (oldest are dropped) ##
+MAX_MEASURES = 5000
+
+# ------------ Function and class used to time the dashboard -
+## Function to get the current memory used by the process ##
+def memory_mb():
+    '''Function to get the resident memory of the process in MB (peak memory when /proc is not available)'''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024 ** 2
+    except OSError:
+        ### ru_maxrss is in KB on linux and in bytes on macOS ###
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+## Function to get the id of the streamlit session running the script ##
+def current_session_id():
+    '''Function to get the streamlit session id, None outside of a streamlit script run'''
+    ### the module of the script run context moved along the streamlit versions (newest first) ###
+    for module_name, function_name in (('streamlit.runtime.scriptrunner', 'get_script_run_ctx'),
+                                       ('streamlit.scriptrunner', 'get_script_run_ctx'),
+                                       ('streamlit.script_run_context', 'get_script_run_ctx'),
+                                       ('streamlit.report_thread', 'get_report_ctx')):
+        try:
+            get_script_run_ctx = getattr(importlib.import_module(module_name), function_name)
+        except (ImportError, AttributeError):
+            continue
+        ctx = get_script_run_ctx()
+        return None if ctx is None else ctx.session_id
+    return None
+
+## Class Object to record the duration and memory of each section of the dashboard, shared by all sessions ##
+class PerfMonitor:
+
+    def __init__(self, max_measures=MAX_MEASURES):
+        self.max_measures = max_measures
+        ### section --> measures (session id, start time, duration in ms, memory in MB) ###
+        self._measures = defaultdict(lambda: deque(maxlen=self.max_measures))
+        self._lock = threading.Lock()
+
+    def record(self, section, duration_ms, session_id=None, memory=None):
+        '''Function to add a measure of a section
+        --> section: name of the timed part (data load, shap values, API call, figure, ...)
+        --> duration_ms: duration in milliseconds
+        --> session_id: id of the session, None for a measure not linked to a session'''
+        measure = (session_id, time.time(), duration_ms, memory_mb() if memory is None else memory)
+        with self._lock:
+            self._measures[section].append(measure)
+
+    @contextmanager
+    def timer(self, section, session_id=None):
+        '''Context manager to time a block of code: with perf_monitor.timer('section', session_id): ...'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(section, (time.perf_counter() - start) * 1000, session_id)
+
+    def measures(self):
+        '''Function to get all the measures as a dataframe (one line per measure)'''
+        with self._lock:
+            rows = [(section,) + measure for section, measures in self._measures.items() for measure in measures]
+        return pd.DataFrame(rows, columns=['section', 'session_id', 'timestamp', 'duration_ms', 'memory_mb'])
+
+    def summary(self, session_id=None):
+        '''Function to get count, p50, p95 and max duration and the last memory of each section
+        --> session_id: only the measures of this session, all the sessions if None'''
+        df = self.measures()
+        if session_id is not None:
+            df = df[df['session_id'] == session_id]
+        if len(df) == 0:
+            return pd.DataFrame(columns=['count', 'p50_ms', 'p95_ms', 'max_ms', 'memory_mb'])
+        grouped = df.groupby('section')
+        return pd.DataFrame({'count': grouped['duration_ms'].size(),
+                             'p50_ms': grouped['duration_ms'].agg(lambda d: np.percentile(d, 50)),
+                             'p95_ms': grouped['duration_ms'].agg(lambda d: np.percentile(d, 95)),
+                             'max_ms': grouped['duration_ms'].max(),
+                             'memory_mb': grouped['memory_mb'].last()}).round(2)
+
+    def to_csv(self):
+        '''Function to export all the measures in CSV format'''
+        return self.measures().to_csv(index=False)
+
+    def to_json(self):
+        '''Function to export the aggregated summary and all the measures in JSON format'''
+        return json.dumps({'summary': self.summary().reset_index().to_dict(orient='records'),
+                           'measures': self.measures().to_dict(orient='records')}, default=str)
+
+    def clear(self):
+        with self._lock:
+            self._measures.clear()
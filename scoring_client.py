@@ -0,0 +1,142 @@
+# ------------ Libraries import ---------------------------
+import os
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
+from lru_cache import LRUCache
+
+## probability over which the loan is refused (same as the API model) ##
+TRESHOLD = 0.49
+## careful the url of the API should be change for serial deployment!! (or set with SCORING_API_URL environment variable) ##
+URL_API_MODEL_RESULT = os.environ.get('SCORING_API_URL', 'https://api-home-risk-oc-7.herokuapp.com/scores')
+
+# ------------ Function and class used to call the scoring API -
+## Class Object with the API answer for one loan ##
+class Score:
+
+    def __init__(self, cust_id, credit_score, answer):
+        ### Id of the customer request ###
+        self.cust_id = cust_id
+        ### probability of default of payment ###
+        self.credit_score = credit_score
+        ### loan acceptation ###
+        self.answer = answer
+
+## Class Object to get the scores from the API with a pooled keep-alive session ##
+class ScoringClient:
+
+    def __init__(self, url=URL_API_MODEL_RESULT, timeout=(3.05, 10), retries=3, pool_size=10,
+                 cache_size=1024, cache_ttl=300):
+        '''--> url: url of the /scores endpoint of the API
+        --> timeout: (connection, read) timeout in seconds for each call
+        --> retries: number of retries on connection errors and 5xx answers (not on read timeouts)
+        --> pool_size: number of keep-alive connections, also used as number of threads for prefetch
+        --> cache_size, cache_ttl: maximum number of scores kept and their time to live in seconds'''
+        self.url = url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self.session = requests.Session()
+        ### a read timeout is not retried: a hung API would otherwise block the rerun (retries + 1) times the read timeout ###
+        retry = Retry(total=retries, read=0, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        ### threads used to score several loans concurrently ###
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def _request(self, cust_id):
+        ### Be careful to the params, with must have a dict with index / ID loan value. It is how it is implemented in our API ###
+        response = self.session.get(url=self.url, params={'index': cust_id}, timeout=self.timeout)
+        response.raise_for_status()
+        result = response.json()
+        return Score(cust_id, float(result['Credit_score']), bool(result['Answer']))
+
+    def score(self, cust_id):
+        '''Function to get the score of a loan, from the cache if it has already been asked recently
+        --> cust_id: Id of a customer request
+        it returns a Score object'''
+        score = self.cache.get(cust_id)
+        if score is None:
+            score = self._request(cust_id)
+            self.cache.set(cust_id, score)
+        return score
+
+    def _submit_missing(self, cust_ids):
+        return [self.executor.submit(self.score, cust_id) for cust_id in cust_ids if self.cache.get(cust_id) is None]
+
+    def prefetch(self, cust_ids):
+        '''Function to score several loans concurrently and keep them in the cache
+        --> cust_ids: list of Id of customer requests
+        it returns a dict Id --> Score object (loans where the API failed are missing)'''
+        for future in self._submit_missing(cust_ids):
+            ### errors are not raised here, score will raise them if the loan is asked again ###
+            future.exception()
+        scores = {}
+        for cust_id in cust_ids:
+            score = self.cache.get(cust_id)
+            if score is not None:
+                scores[cust_id] = score
+        return scores
+
+    def prefetch_async(self, cust_ids):
+        '''Function to start scoring several loans in background threads without waiting for the answers'''
+        self._submit_missing(cust_ids)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+## Class Object to score the loans in-process with the lgbm model stored in the shap tree explainer ##
+class LocalScorer:
+
+    def __init__(self, shap_explainer, df, features, treshold=TRESHOLD):
+        '''--> shap_explainer: shap tree explainer of our lgbm model (the model trees are inside it)
+        --> df: dataframe with all customer data (standard scaled), must have an ID for customer credit request
+        --> features: features column name used by the model
+        --> treshold: probability over which the loan is refused'''
+        self.model = shap_explainer.model
+        self.features = features
+        self.treshold = treshold
+        self.index = df.index
+        ### all the loans are scored in one vectorized pass, then each score is a lookup ###
+        self.probabilities = self.predict(df)
+
+    def predict(self, df):
+        '''Function to get the probability of default of all the rows of df in one batch'''
+        X = df[self.features].to_numpy(dtype=np.float64)
+        original_model = getattr(self.model, 'original_model', None)
+        if original_model is not None:
+            ### lightgbm Booster with binary objective returns the probability ###
+            return np.asarray(original_model.predict(X), dtype=np.float64)
+        ### otherwise use the trees of the explainer, their output is in log odds ###
+        return 1 / (1 + np.exp(-np.asarray(self.model.predict(X), dtype=np.float64)))
+
+    def answers(self, treshold=None):
+        '''Function to get the loan acceptation of all the loans for a treshold without scoring again'''
+        return self.probabilities < (self.treshold if treshold is None else treshold)
+
+    def score(self, cust_id):
+        '''Function to get the score of a loan
+        --> cust_id: Id of a customer request
+        it returns a Score object'''
+        credit_score = float(self.probabilities[self.index.get_loc(cust_id)])
+        return Score(cust_id, credit_score, credit_score < self.treshold)
+
+    def prefetch(self, cust_ids):
+        '''Function to get the scores of several loans (they are all already computed)'''
+        return {cust_id: self.score(cust_id) for cust_id in cust_ids}
+
+    def prefetch_async(self, cust_ids):
+        pass
+
+    def parity_check(self, reference, tolerance=1e-6):
+        '''Function to compare the local probabilities with a reference (e.g. the TARGET_PROB column)
+        --> reference: series of probabilities with the same ID index
+        it returns the maximum absolute difference and if it is under the tolerance'''
+        difference = np.abs(self.probabilities - reference.reindex(self.index).to_numpy(dtype=np.float64))
+        max_difference = float(np.nanmax(difference))
+        return max_difference, max_difference <= tolerance
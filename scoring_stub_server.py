@@ -0,0 +1,84 @@
+# ------------ Libraries import ---------------------------
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+## same treshold as the API model ##
+TRESHOLD = 0.49
+
+# ------------ Local stub of the scoring API for tests ---
+## Function to create the request handler answering with the given scores ##
+def make_handler(scores, treshold=TRESHOLD, delay=0., failures=0):
+    '''Function to create a handler class answering /scores?index=<ID> like our API Flask
+    --> scores: dict Id loan --> probability of default
+    --> treshold: probability over which the loan is refused
+    --> delay: seconds waited before each answer (to test the timeouts)
+    --> failures: number of first requests answered with a 503 error (to test the retries)
+    the number of requests received is counted in the calls attribute of the handler class'''
+
+    class StubScoresHandler(BaseHTTPRequestHandler):
+        calls = 0
+        _lock = threading.Lock()
+
+        def do_GET(self):
+            with self._lock:
+                StubScoresHandler.calls += 1
+                calls = StubScoresHandler.calls
+            time.sleep(delay)
+            try:
+                self._answer(calls)
+            except ConnectionError:
+                ### the client stopped waiting (timeout), nothing to answer ###
+                pass
+
+        def _answer(self, calls):
+            if calls <= failures:
+                self.send_error(503)
+                return
+            url = urlparse(self.path)
+            index = parse_qs(url.query).get('index', [None])[0]
+            if url.path != '/scores' or index is None:
+                self.send_error(404)
+                return
+            try:
+                index = int(index)
+            except ValueError:
+                self.send_error(400, 'index must be an integer')
+                return
+            if index not in scores:
+                self.send_error(404)
+                return
+            credit_score = float(scores[index])
+            body = json.dumps({'Credit_score': credit_score, 'Answer': int(credit_score < treshold)}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            ### keep the test output clean ###
+            pass
+
+    return StubScoresHandler
+
+## Function to start the stub server in a background thread ##
+def start_stub_server(scores, host='127.0.0.1', port=0, treshold=TRESHOLD, delay=0., failures=0):
+    '''Function to serve the scores locally, port=0 lets the system choose a free port
+    it returns the server (call shutdown() to stop it) and the url of the /scores endpoint'''
+    server = ThreadingHTTPServer((host, port), make_handler(scores, treshold, delay, failures))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/scores'
+
+if __name__ == '__main__':
+    ## serve the probabilities of the data file: python scoring_stub_server.py [port] ##
+    from column_store import load_frame
+    from home_risk_assets import DATA_PATH, TARGET
+    df = load_frame(DATA_PATH, [TARGET])
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(df[TARGET].to_dict()))
+    print(f'Stub scoring API on http://127.0.0.1:{port}/scores')
+    server.serve_forever()
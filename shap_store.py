@@ -0,0 +1,126 @@
+# ------------ Libraries import ---------------------------
+import os
+import numpy as np
+
+## folder where shap values are stored, one file per assets version ##
+SHAP_CACHE_DIR = r'shap_cache'
+
+# ------------ Function and class used to store shap values -
+## Class Object to serve shap values computed once per model/data version ##
+class ShapStore:
+
+    def __init__(self, version, values, expected_value, index, path=None, incremental=False):
+        ### version of the assets used to compute the shap values ###
+        self.version = version
+        ### float32 array (class, loan, feature), memory-mapped when read from disk ###
+        self.values = values
+        ### expected value of the explainer for each class ###
+        self.expected_value = expected_value
+        ### loan ID of each row of the shap values ###
+        self.index = index
+        ### .npy file of the values and whether it was written by an update (removed when a next update replaces it) ###
+        self.path = path
+        self.incremental = incremental
+
+    def class_values(self, class_index=1):
+        '''Function to get the shap values of all the loans for one class (used for the global summary plot)'''
+        return self.values[class_index]
+
+    def row(self, cust_id, class_index=1):
+        '''Function to get the shap values of a single loan without computing anything
+        --> cust_id: Id of a customer request
+        --> class_index: 1 for the probability of default, 0 for the opposite class'''
+        return self.values[class_index, self.index.get_loc(cust_id), :]
+
+## Function to convert the explainer output in a single float32 array ##
+def _stack_shap_values(shap_values):
+    '''Function to get a (class, loan, feature) float32 array whatever the explainer returns
+    (list of array per class or single array for the positive class)'''
+    if isinstance(shap_values, list):
+        return np.stack([np.asarray(v, dtype=np.float32) for v in shap_values])
+    shap_values = np.asarray(shap_values, dtype=np.float32)
+    if shap_values.ndim == 2:
+        ### only the positive class is returned, the other one is its opposite ###
+        return np.stack([-shap_values, shap_values])
+    return shap_values
+
+## Function to compute shap values in batches to limit the memory used by the explainer ##
+def compute_shap_values(shap_explainer, X, batch_size=5000):
+    '''Function to compute the shap values of all the rows of X by batch
+    --> shap_explainer: shap tree explainer of our model
+    --> X: dataframe with the features only (standard scaled)
+    it returns a (class, loan, feature) float32 array'''
+    batches = [_stack_shap_values(shap_explainer.shap_values(X.iloc[start:start + batch_size]))
+               for start in range(0, len(X), batch_size)]
+    return np.concatenate(batches, axis=1)
+
+## Function to get the expected value of each class ##
+def _expected_values(shap_explainer):
+    expected_value = np.atleast_1d(np.asarray(shap_explainer.expected_value, dtype=np.float64))
+    if expected_value.shape[0] == 1:
+        expected_value = np.array([-expected_value[0], expected_value[0]])
+    return expected_value
+
+## Function to save shap values so that a concurrent reader never sees a partial file ##
+def _save_values(path, values):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    ### write in a temporary file first, then rename it ###
+    tmp_path = path + f'.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+## Function to load shap values from disk or compute and save them ##
+def load_shap_store(assets, cache_dir=SHAP_CACHE_DIR):
+    '''Function to get the shap store of the assets version.
+    The shap values are computed only if they are not already saved in the cache folder for this version,
+    the .npy file is then memory-mapped so that all the sessions share the same pages
+    --> assets: HomeRiskAssets object with data and explainer
+    --> cache_dir: folder where .npy files are stored
+    it returns a ShapStore object'''
+    path = os.path.join(cache_dir, f'shap_values_{assets.version}.npy')
+    if not os.path.exists(path):
+        _save_values(path, compute_shap_values(assets.shap_explainer, assets.df_test_sample[assets.features]))
+    values = np.load(path, mmap_mode='r')
+    return ShapStore(assets.version, values, _expected_values(assets.shap_explainer), assets.df_test_sample.index, path)
+
+## Function to update the shap values of some loans only ##
+def update_shap_store(shap_store, assets, changed_ids, cache_dir=SHAP_CACHE_DIR):
+    '''Function to build the shap store of a new assets version from the previous one.
+    Only the shap values of the new or updated loans are computed, the others are copied.
+    The file of the previous version is removed if it was written by an update (the file of the loaded version
+    is kept for the next start), sessions still using it keep reading it through their memory map
+    --> shap_store: ShapStore of the previous version
+    --> assets: HomeRiskAssets of the new version (previous loans first, in the same order, new loans at the end)
+    --> changed_ids: Id of the new or updated loans
+    it returns a ShapStore object'''
+    values = np.zeros((shap_store.values.shape[0], len(assets.df_test_sample), shap_store.values.shape[2]), dtype=np.float32)
+    values[:, :shap_store.values.shape[1], :] = shap_store.values
+    changed_positions = assets.df_test_sample.index.get_indexer(changed_ids)
+    values[:, changed_positions, :] = compute_shap_values(assets.shap_explainer, assets.df_test_sample.iloc[changed_positions][assets.features])
+    path = os.path.join(cache_dir, f'shap_values_{assets.version}.npy')
+    _save_values(path, values)
+    new_store = ShapStore(assets.version, np.load(path, mmap_mode='r'), shap_store.expected_value, assets.df_test_sample.index, path, True)
+    if shap_store.incremental and shap_store.path != path:
+        try:
+            os.remove(shap_store.path)
+        except OSError:
+            ### e.g. on Windows a memory-mapped file can not be removed, it is then left in the cache folder ###
+            pass
+    return new_store
+
+## Function to remove the shap values of the versions which are no longer used ##
+def clean_shap_cache(keep_version, cache_dir=SHAP_CACHE_DIR):
+    '''Function to remove all the saved shap values except the ones of keep_version (e.g. when the base files changed).
+    Sessions still using a removed file keep reading it through their memory map
+    --> keep_version: version of the assets whose shap values are kept'''
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        ### temporary files are left, a session may still be writing them ###
+        if name.startswith('shap_values_') and name.endswith('.npy') and name != f'shap_values_{keep_version}.npy':
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                ### e.g. on Windows a memory-mapped file can not be removed, it is then left in the cache folder ###
+                pass
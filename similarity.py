@@ -0,0 +1,52 @@
+# ------------ Libraries import ---------------------------
+import numpy as np
+from sklearn.neighbors import BallTree, KDTree
+
+## metrics available for the similarity between customers ##
+METRICS = ['euclidean', 'manhattan', 'chebyshev']
+## above this number of features the kd-tree is less efficient than the ball-tree ##
+KD_TREE_MAX_FEATURES = 20
+## number of trees kept in memory by the dashboard (each one holds a copy of the features it uses) ##
+MAX_INDEXES = 4
+
+# ------------ Function and class used to find similar customers -
+## Class Object with a tree over the standard scaled features, built once and queried for every request ##
+class FeatureNeighbourIndex:
+
+    def __init__(self, df, features, metric='euclidean', leaf_size=40):
+        ### features used for the distance (standard scaled, so they all have the same weight) ###
+        self.features = list(features)
+        self.metric = metric
+        self.index = df.index
+        X = np.ascontiguousarray(df[self.features].to_numpy(dtype=np.float64))
+        tree_class = KDTree if len(self.features) <= KD_TREE_MAX_FEATURES else BallTree
+        ### the tree keeps the only copy of the features, the query rows are read from it ###
+        self.tree = tree_class(X, leaf_size=leaf_size, metric=metric)
+        self._X = self.tree.get_arrays()[0]
+
+    def query(self, cust_id, n_near_cust):
+        '''Function to get the customer and its n_near_cust most similar customers in the feature space
+        --> cust_id: Id of a customer request
+        --> n_near_cust: number of similar customer to the id request
+        it returns the positions in the dataframe (the customer first) and the distances to the customer'''
+        index_cust = self.index.get_loc(cust_id)
+        k = min(n_near_cust + 1, len(self.index))
+        distance, positions = self.tree.query(self._X[index_cust:index_cust + 1], k=k)
+        distance, positions = distance[0], positions[0]
+        ### with duplicated rows the customer may not be returned first, it must always be in the result ###
+        if positions[0] != index_cust:
+            others = positions != index_cust
+            positions = np.concatenate([[index_cust], positions[others][:k - 1]])
+            distance = np.concatenate([[0.], distance[others][:k - 1]])
+        return positions, distance
+
+## Function to filter dataset with the most similar customers in terms of features ##
+def filter_similar_customer(df, cust_id, n_near_cust, feature_index):
+    ''' Function to filter dataframe regarding the most similar customers of our customer in the feature space.
+    Note that the customer is included in the filtered DF
+    --> df: dataframe with all customer data, the same used to build feature_index
+    --> cust_id: Id of a customer request
+    --> n_near_cust: number of similar customer to the id request
+    --> feature_index: FeatureNeighbourIndex built on df'''
+    positions, _ = feature_index.query(cust_id, n_near_cust)
+    return df.iloc[positions]
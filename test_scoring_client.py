@@ -0,0 +1,101 @@
+# ------------ Libraries import ---------------------------
+import time
+import unittest
+import requests
+from scoring_client import ScoringClient
+from scoring_stub_server import start_stub_server
+
+## probabilities served by the stub, one refused and one accepted loan ##
+SCORES = {100001: 0.8, 100002: 0.1}
+
+# ------------ Tests of the scoring API client with the local stub server -
+class ScoringClientTest(unittest.TestCase):
+
+    def start(self, **kwargs):
+        ### stub server and client stopped at the end of each test ###
+        server, url = start_stub_server(SCORES, **kwargs)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.calls = lambda: server.RequestHandlerClass.calls
+        return url
+
+    def client(self, url, **kwargs):
+        client = ScoringClient(url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_score(self):
+        client = self.client(self.start())
+        score = client.score(100001)
+        self.assertEqual((score.cust_id, score.credit_score, score.answer), (100001, 0.8, False))
+        self.assertTrue(client.score(100002).answer)
+
+    def test_cache(self):
+        client = self.client(self.start())
+        client.score(100001)
+        client.score(100001)
+        self.assertEqual(self.calls(), 1)
+
+    def test_cache_expiry(self):
+        client = self.client(self.start(), cache_ttl=0.05)
+        client.score(100001)
+        time.sleep(0.1)
+        client.score(100001)
+        self.assertEqual(self.calls(), 2)
+
+    def test_retry_on_server_error(self):
+        client = self.client(self.start(failures=2), retries=3)
+        self.assertEqual(client.score(100001).credit_score, 0.8)
+        self.assertEqual(self.calls(), 3)
+
+    def test_retries_exhausted(self):
+        client = self.client(self.start(failures=10), retries=1)
+        with self.assertRaises(requests.RequestException):
+            client.score(100001)
+        self.assertEqual(self.calls(), 2)
+
+    def test_timeout(self):
+        client = self.client(self.start(delay=0.5), timeout=(1, 0.1), retries=0)
+        with self.assertRaises(requests.RequestException):
+            client.score(100001)
+
+    def test_timeout_not_retried(self):
+        ### default retries: a hung API is asked once, not once per retry ###
+        client = self.client(self.start(delay=0.5), timeout=(1, 0.2))
+        start = time.monotonic()
+        with self.assertRaises(requests.RequestException):
+            client.score(100001)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.calls(), 1)
+
+    def test_unknown_loan(self):
+        client = self.client(self.start())
+        with self.assertRaises(requests.HTTPError):
+            client.score(999)
+        ### errors are not kept in the cache ###
+        with self.assertRaises(requests.HTTPError):
+            client.score(999)
+        self.assertEqual(self.calls(), 2)
+
+    def test_prefetch_skips_errors(self):
+        client = self.client(self.start())
+        scores = client.prefetch([100001, 999, 100002])
+        self.assertEqual(sorted(scores), [100001, 100002])
+        ### prefetched loans are then served from the cache ###
+        client.score(100002)
+        self.assertEqual(self.calls(), 3)
+
+    def test_prefetch_async(self):
+        client = self.client(self.start())
+        client.prefetch_async([100001, 100002])
+        client.executor.shutdown(wait=True)
+        self.assertIsNotNone(client.cache.get(100001))
+        self.assertIsNotNone(client.cache.get(100002))
+
+    def test_bad_index(self):
+        url = self.start()
+        self.assertEqual(requests.get(url, params={'index': 'abc'}, timeout=5).status_code, 400)
+        self.assertEqual(requests.get(url, timeout=5).status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()